@@ -1,10 +1,20 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, current_app
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, send_file, current_app
 import os
 from datetime import datetime, date
 import random
-from models.locations import locations # Locations list
+import secrets
+import gzip
+import click
+import httpx
+from itsdangerous import URLSafeTimedSerializer, BadData
 from models.game import GameLogic # Scoring logic
-from utils.database import SupabaseManager # Database access
+from models.location_index import location_index # Compiled locations (ids, valid answers, JSON payload)
+from utils.database import SupabaseManager, ImageCatalogCache, PreviewCache # Database access
+from utils.rating_buffer import RatingBuffer # Write-behind ratings
+from utils.session_store import create_session_interface # Server-side sessions
+from utils.page_cache import PageCache # Rendered pages cache
+from utils.image_variants import generate_variants, generate_placeholders, srcset, srcset_widths, DEFAULT_WIDTHS # Resized variants of the images
+from utils.image_proxy import DiskImageCache # Local disk cache of the /img/<id> proxy
 import config # Configuration variables
 import supabase
 
@@ -13,26 +23,207 @@ import supabase
 app = Flask(__name__)
 app.secret_key = config.secret_key
 
+# --- Optional server-side sessions : the session data stays on the server, the cookie only holds an opaque id ---
+# SESSION_BACKEND : "cookie" (default, Flask's signed cookie holding all the data), "memory", "sqlite" or "redis"
+session_interface = create_session_interface(app, getattr(config, 'SESSION_BACKEND', 'cookie'),
+                                             path=getattr(config, 'SESSION_SQLITE_PATH', None),
+                                             url=getattr(config, 'SESSION_REDIS_URL', None),
+                                             max_entries=getattr(config, 'SESSION_MAX_ENTRIES', 10000))
+if session_interface:
+    app.session_interface = session_interface
+
 # --- Get the Supabase connection variables from the config file ---
 app.config['SUPABASE_URL'] = config.URL # os.getenv('URL')
 app.config['SUPABASE_KEY'] = config.APIkey # os.getenv('APIkey')
 
 # --- "Managers" initialisation ---
 # Creating Database manager only if SUPABASE_URL is defined
+# No network call here : the connection is made on first use, so that the workers start serving immediately
 try :
     db_manager = SupabaseManager()
-    print("Supabase connection successfully created")
+    print("Supabase manager successfully created")
 except Exception as e :
-    print(f"Supabase error while creating the connection : {e}")
+    print(f"Supabase error while creating the manager : {e}")
     db_manager = None
 
-# Test the connection to Supabase
+# Connect and test the connection to Supabase in the background (with retries)
 if db_manager:
-    db_manager.test_connection()
+    db_manager.start_health_check()
+
+# Ratings are buffered and written in bulk by a background thread (RATING_BUFFER = False writes each vote directly)
+rating_buffer = None
+if db_manager and getattr(config, 'RATING_BUFFER', True):
+    rating_buffer = RatingBuffer(db_manager,
+                                 flush_interval=getattr(config, 'RATING_FLUSH_INTERVAL', 5),
+                                 flush_size=getattr(config, 'RATING_FLUSH_SIZE', 100),
+                                 max_pictures=getattr(config, 'RATING_BUFFER_MAX_PICTURES', 10000))
     
 # Points calculation logic
 game_logic = GameLogic()
 
+# Optional proxy of the original images : /img/<id> downloads them once and serves them from a local disk cache (IMAGE_PROXY = True)
+image_cache = None
+if getattr(config, 'IMAGE_PROXY', False):
+    image_cache = DiskImageCache(getattr(config, 'IMAGE_PROXY_DIR', None) or os.path.join(app.instance_path, 'images'),
+                                 max_bytes=getattr(config, 'IMAGE_PROXY_MAX_BYTES', 1024**3))
+
+# The menu and game pages are rendered once per (mode, difficulty) and served from memory (PAGE_CACHE = False renders each request)
+page_cache = PageCache(app, version=location_index.version) if getattr(config, 'PAGE_CACHE', True) else None
+
+def render_page(template, score=None, **arguments):
+    """Render a page with the player's score, from the page cache if enabled"""
+    if page_cache:
+        return page_cache.render(template, score=score, **arguments)
+    return render_template(template, score=score or 0, has_score=score is not None, **arguments)
+
+# --- Sample images used when Supabase is not available (dev only) ---
+SAMPLE_IMAGES = [
+    {
+        'id': 1,
+        'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
+        'realm': 'Isle of Dawn',
+        'area': 'Main Isle', 
+        'location': 'Mural Cave',
+        'difficulty': 'easy'
+    },
+    {
+        'id': 2,
+        'url': 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=600&h=400&fit=crop',
+        'realm': 'Daylight Prairie',
+        'area': 'Butterfly Fields',
+        'location': '',
+        'difficulty': 'medium'
+    },
+    {
+        'id': 3,
+        'url': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=600&h=400&fit=crop',
+        'realm': 'Hidden Forest',
+        'area': 'Forest Clearing',
+        'location': 'Plain before the First Gate',
+        'difficulty': 'hard'
+    }
+]
+SAMPLE_DAILY_IMAGES = [
+    {
+        'id': 1,
+        'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
+        'realm': 'Isle of Dawn',
+        'area': 'Main Isle',
+        'location': 'Mural Cave',
+        'difficulty': 'medium'
+    }
+]
+# Preview images of some realms, areas and locations
+SAMPLE_PREVIEWS = [
+    {
+        'id': 1,
+        'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
+        'type': 'realm',
+        'realm': 'Isle of Dawn',
+    },
+    {
+        'id': 2,
+        'url': 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=600&h=400&fit=crop',
+        'type': 'area',
+        'realm': 'Daylight Prairie',
+        'area': 'Butterfly Fields',
+    },
+    {
+        'id': 3,
+        'url': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=600&h=400&fit=crop',
+        'type': 'location',
+        'realm': 'Hidden Forest',
+        'area': 'Forest Clearing',
+        'location': 'First Gate Plain',
+    }
+]
+# Preview manifest of the sample previews
+SAMPLE_PREVIEW_CACHE = PreviewCache()
+SAMPLE_PREVIEW_CACHE.load(SAMPLE_PREVIEWS)
+# Answers of the sample images, by id
+SAMPLE_ANSWERS = {img['id']: img for img in SAMPLE_IMAGES + SAMPLE_DAILY_IMAGES}
+
+def get_answer(image_id):
+    """
+    Get the answer of an image from the answer index (the sample images in dev).
+
+    Returns:
+        dict|None: realm, area and location of the image, None if the image is unknown
+    """
+    if db_manager:
+        return db_manager.get_answer(game_logic, image_id)
+    return SAMPLE_ANSWERS.get(image_id)
+
+def proxied(image_data):
+    """
+    Point the url of an image, and the srcset of its variants, to the /img/<id> proxy when it is enabled.
+
+    Returns:
+        dict|None: a copy of the image with the proxied urls (the image itself if the proxy is disabled)
+    """
+    if image_cache and image_data:
+        variants = {key: srcset({width: url_for('proxy_variant', image_id=image_data['id'], width=width, format=format)
+                                 for width in srcset_widths(image_data.get(key, ''))})
+                    for key, format in [('srcset', 'webp'), ('srcset_avif', 'avif')] if key in image_data}
+        return dict(image_data, url=url_for('proxy_image', image_id=image_data['id']), **variants)
+    return image_data
+
+def get_hunt_difficulty():
+    """
+    Read the difficulty requested from the hunt API views, before it is used as a key of the session.
+
+    Returns:
+        tuple: (difficulty, None) or (None, error response) if the difficulty is unknown
+    """
+    difficulty = request.args.get('difficulty', "Easy")
+    if difficulty.lower() not in ImageCatalogCache.DIFFICULTIES:
+        return None, (jsonify({'error': f'Unknown difficulty {difficulty}'}), 400)
+    return difficulty, None
+
+def get_deck(difficulty):
+    """
+    Player's deck of a difficulty : the images of a difficulty are drawn without repetition until all of them
+    have been seen. The decks are stored in the session as {difficulty: {seed, cursor, size, fingerprint}}.
+
+    Returns:
+        dict: a copy of the deck, to store back with save_deck once an image is drawn
+    """
+    return dict(session.get('decks', {}).get(difficulty.lower(), {}))
+
+def save_deck(difficulty, deck):
+    """Store the deck of a difficulty in the session"""
+    decks = dict(session.get('decks', {}))
+    decks[difficulty.lower()] = deck
+    session['decks'] = decks
+
+def draw_hunt_image(difficulty, deck):
+    """
+    Draw the next image of a deck for a difficulty (the deck is updated in place, not saved in the session).
+
+    Returns:
+        dict|None: the image, None if there is no image for this difficulty
+    """
+    # Prod case : if Supabase is avalaible
+    if db_manager:
+        image_data = db_manager.get_random_image(game_logic, difficulty, deck)
+    # Dev case : the hard coded sample list of images, filtered to match the difficulty (or its first image)
+    else:
+        filtered_images = [img for img in SAMPLE_IMAGES if img['difficulty'] == difficulty.lower()] or SAMPLE_IMAGES[:1]
+        image_data = filtered_images[game_logic.draw_from_deck(deck, len(filtered_images))]
+    return proxied(image_data)
+
+def pick_hunt_image(difficulty):
+    """
+    Pick the next image of the player's deck for a difficulty.
+
+    Returns:
+        dict|None: the image, None if there is no image for this difficulty
+    """
+    deck = get_deck(difficulty)
+    image_data = draw_hunt_image(difficulty, deck)
+    save_deck(difficulty, deck)
+    return image_data
+
 # -- HTML pages routes --
 
 @app.route('/favicon.ico')
@@ -45,7 +236,7 @@ def favicon():
 @app.route('/')
 def menu():
     """Home page with the main menu"""
-    return render_template('menu.html')
+    return render_page('menu.html', score=session.get('score'))
 
 # Redirect to game (easy)
 @app.route('/game')
@@ -69,73 +260,141 @@ def game(mode):
     session['score'] = session.get('score', 0) # Keep the score if already existing, else score = 0
     
     # To rend the game page with useful data in the frontend
-    return render_template('game.html', 
-                         mode=mode, 
-                         difficulty=difficulty,
-                         locations=locations)
+    return render_page('game.html',
+                       score=session['score'],
+                       mode=mode,
+                       difficulty=difficulty,
+                       locations_version=location_index.version)
 
 
 # --- JSON API : pick up a new image ---
 
+def new_image_response(difficulty, image_data):
+    """Response of /api/new-image for the picked image"""
+    # If no image exist for the selected difficulty
+    if not image_data:
+        return jsonify({
+            'error': f'No image found for the difficulty {difficulty}'
+        }), 404
+    
+    # Store only the id of the chosen image in the current session (the answer is looked up with get_answer)
+    session['current_image_id'] = image_data['id']
+    
+    # Return the image on the frontend (JSON)
+    return jsonify(image_data)
+
 # Get /api/new-image
 @app.route('/api/new-image')
 def get_new_image():
     """API to select a new image according to the difficulty"""
-    difficulty = request.args.get('difficulty', "Easy")
-    
-    # Prod case : if Supabase is avalaible
-    if db_manager:
-        # We request an image adapted to the difficulty
-        image_data = db_manager.get_random_image(game_logic, difficulty)
-
-        # If no image exist for the selected difficulty
-        if not image_data:
-            return jsonify({
-                'error': f'No image found for the difficulty {difficulty}'
-            }), 404
-
-    # Dev case : else
+    difficulty, error = get_hunt_difficulty()
+    if error:
+        return error
+
+    # We request the next image of the player's deck for the difficulty
+    return new_image_response(difficulty, pick_hunt_image(difficulty))
+
+# --- JSON API : prefetch the next rounds of the hunt ---
+
+# The round tokens are signed with the secret key and carry everything needed to play the round : the image id,
+# the difficulty, the number of the round and the deck after its image. /api/next-images doesn't write the session,
+# so a batch fetched in the background can't overwrite the score of an answer sent meanwhile.
+# The session only keeps, per difficulty, the number of the next round that can be played (see load_round).
+round_serializer = URLSafeTimedSerializer(app.secret_key, salt='hunt-round')
+
+def get_batch_size():
+    """Number of rounds requested from /api/next-images (n, between 1 and 5, 3 by default)"""
+    n = request.args.get('n', "3")
+    return min(max(int(n), 1), 5) if n.isdigit() else 3
+
+def get_round_number(difficulty):
+    """
+    Returns:
+        int: number of the next round of a difficulty that can be played, the previous ones are played or skipped
+    """
+    return session.get('rounds', {}).get(difficulty.lower(), 0)
+
+def load_round(token):
+    """
+    Read a round token of /api/next-images.
+
+    Returns:
+        dict|None: the round {'id', 'difficulty', 'number', 'deck'}, None if the token is invalid, older than
+        ROUND_MAX_AGE seconds, or if the round (or a later one of its difficulty) has already been played
+    """
+    try:
+        hunt_round = round_serializer.loads(token, max_age=getattr(config, 'ROUND_MAX_AGE', 24 * 3600))
+    except BadData:
+        return None
+    if hunt_round['number'] < get_round_number(hunt_round['difficulty']):
+        return None
+    return hunt_round
+
+def next_images_response(difficulty, images, tokens):
+    """
+    Response of /api/next-images for the picked images and their round tokens.
+
+    Returns:
+        Response: the rounds, 404 if an image is missing
+    """
+    if not images or not all(images):
+        return jsonify({
+            'error': f'No image found for the difficulty {difficulty}'
+        }), 404
+
+    return jsonify([{
+        'round': token,
+        'id': image_data['id'],
+        'url': image_data['url'],
+        'srcset': image_data.get('srcset', ''),
+        'placeholder': image_data.get('placeholder', ''),
+        'difficulty': image_data['difficulty'],
+        'rating_count': image_data.get('rating_count', 0)
+    } for image_data, token in zip(images, tokens)])
+
+# Get /api/next-images?difficulty=&n=&after=
+@app.route('/api/next-images')
+def get_next_images():
+    """
+    API to select a batch of upcoming images according to the difficulty, so the frontend can preload them.
+    The answers are not sent : each image comes with a round token, sent back to /api/check-answer.
+    The batch follows the round given by after (the last one queued by the frontend), else the last round played.
+    """
+    difficulty, error = get_hunt_difficulty()
+    if error:
+        return error
+
+    previous = load_round(request.args.get('after', ''))
+    if previous and previous['difficulty'] == difficulty.lower():
+        number, deck = previous['number'] + 1, dict(previous['deck'])
     else:
-        # We use this hard coded sample list of images as an instance
-        sample_images = [
-            {
-                'id': 1,
-                'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
-                'realm': 'Isle of Dawn',
-                'area': 'Main Isle', 
-                'location': 'Mural Cave',
-                'difficulty': 'easy'
-            },
-            {
-                'id': 2,
-                'url': 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=600&h=400&fit=crop',
-                'realm': 'Daylight Prairie',
-                'area': 'Butterfly Fields',
-                'location': '',
-                'difficulty': 'medium'
-            },
-            {
-                'id': 3,
-                'url': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=600&h=400&fit=crop',
-                'realm': 'Hidden Forest',
-                'area': 'Forest Clearing',
-                'location': 'Plain before the First Gate',
-                'difficulty': 'hard'
-            }
-        ]
-        # Sub-list of images filtered to match the current difficulty
-        filtered_images = [img for img in sample_images if img['difficulty'] == difficulty]
-        # If filetered_images is not empty, then we chose a random image in it, else we pick the first image in sample_images
-        image_data = random.choice(filtered_images) if filtered_images else sample_images[0]
-    
-    # Store the chosen image in the current session (needed for the verification of the player's answers)
-    session['current_image'] = image_data
-    
-    # Return the image on the frontend (JSON)
-    return jsonify(image_data)
+        number, deck = get_round_number(difficulty), get_deck(difficulty)
+
+    images, tokens = [], []
+    for _ in range(get_batch_size()):
+        images.append(draw_hunt_image(difficulty, deck))
+        if not images[-1]:
+            break
+        tokens.append(round_serializer.dumps({'id': images[-1]['id'], 'difficulty': difficulty.lower(),
+                                              'number': number, 'deck': dict(deck)}))
+        number += 1
+    return next_images_response(difficulty, images, tokens)
 
 # --- JSON API : daily picture ---
 
+def daily_image_response(image_data):
+    """Response of /api/daily-image for the daily picture"""
+    # If no daily image is found
+    if not image_data:
+        return jsonify({
+            'error': 'No avalaible daily picture'
+        }), 404
+
+    # Storing the id of the daily picture in the current session
+    session['current_image_id'] = image_data['id']
+    # Return the daily picture in the frontend
+    return jsonify(proxied(image_data))
+
 # Get /api/daily-image
 @app.route('/api/daily-image')
 def get_daily_image():
@@ -146,91 +405,69 @@ def get_daily_image():
     if db_manager:
         image_data = db_manager.get_supabase_daily()
 
-        # If no daily image is found
-        if not image_data:
-            return jsonify({
-                'error': 'No avalaible daily picture'
-            }), 404
-
     # Dev case : daily picture is chosen putting a seed on the current date and with a sample list
     else:
         random.seed(today.toordinal())
-        sample_images = [
-            {
-                'id': 1,
-                'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
-                'realm': 'Isle of Dawn',
-                'area': 'Main Isle',
-                'location': 'Mural Cave',
-                'difficulty': 'medium'
-            }
-        ]
-        image_data = random.choice(sample_images)
+        image_data = random.choice(SAMPLE_DAILY_IMAGES)
         random.seed()  # Reinitialisation of the seed
-    
-    # Storing the daily picture in the current session
-    session['current_image'] = image_data
-    # Return the daily picture in the frontend
-    return jsonify(image_data)
+    return daily_image_response(image_data)
 
 
-# --- JSON API : check the players' answer ---
+# --- JSON API : preview images ---
 
-# Get /api/new-image
-@app.route('/api/preview-image')
-def get_preview_image():
-    """API to select a new image according to the difficulty"""
+def get_preview_arguments():
+    """
+    Read the preview requested from /api/preview-image.
+
+    Returns:
+        tuple: ((type, realm, area, location), None) or (None, error response)
+    """
     type = request.args.get('type', "")
     realm = request.args.get('realm', "")
     area = request.args.get('area', "")
     location = request.args.get('location', "")
     if type.lower() not in ["realm", "area", "location"]:
-        return jsonify({"error": "Unknown preview type: "+type}), 404
+        return None, (jsonify({"error": "Unknown preview type: "+type}), 404)
     elif realm=="" or (type.lower() in ["area", "location"] and area == "") or (type.lower() == "location" and location==""):
-        return jsonify({"error": "Not enough arguments provided: '"+realm+"' > '"+area+"' > '"+location+"'"}), 404
-
+        return None, (jsonify({"error": "Not enough arguments provided: '"+realm+"' > '"+area+"' > '"+location+"'"}), 404)
+    return (type, realm, area, location), None
+
+def preview_image_response(image_data):
+    """Response of /api/preview-image, the browsers reuse it for PREVIEW_MAX_AGE seconds then revalidate it"""
+    response = jsonify(image_data)
+    response.cache_control.public = True
+    response.cache_control.max_age = getattr(config, 'PREVIEW_MAX_AGE', 3600)
+    response.add_etag()
+    return response.make_conditional(request)
+
+def preview_not_found(type, realm, area, location):
+    return jsonify({
+        'error': f'No image found for the preview of {type}: "{realm}" > "{area}" > "{location}"'
+    }), 404
+
+# Get /api/preview-image
+@app.route('/api/preview-image')
+def get_preview_image():
+    """API to get the preview image of a realm, area or location"""
+    arguments, error = get_preview_arguments()
+    if error:
+        return error
+    type, realm, area, location = arguments
 
     # Prod case : if Supabase is avalaible
     if db_manager:
-        # We request an image adapted to the difficulty
         image_data = db_manager.get_preview_image(type, realm, area, location)
 
         # If no image exist for the selected difficulty
         if not image_data:
-            return jsonify({
-                'error': f'No image found for the preview of {type}: "{realm}" > "{area}" > "{location}"'
-            }), 404
+            return preview_not_found(type, realm, area, location)
 
     # Dev case : else
     else:
-        # We use this hard coded sample list of images as an instance
-        sample_images = [
-            {
-                'id': 1,
-                'url': 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=600&h=400&fit=crop',
-                'type': 'realm',
-                'realm': 'Isle of Dawn',
-            },
-            {
-                'id': 2,
-                'url': 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=600&h=400&fit=crop',
-                'type': 'area',
-                'realm': 'Daylight Prairie',
-                'area': 'Butterfly Fields',
-            },
-            {
-                'id': 3,
-                'url': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=600&h=400&fit=crop',
-                'type': 'location',
-                'realm': 'Hidden Forest',
-                'area': 'Forest Clearing',
-                'location': 'First Gate Plain',
-            }
-        ]
         # Sub-list of images filtered to match the current difficulty
-        filtered_images = [img for img in sample_images if img['type'] == type and img["realm"] == realm
+        filtered_images = [img for img in SAMPLE_PREVIEWS if img['type'] == type and img["realm"] == realm
                 and (type=="realm" or img["area"] == area) and (type!="location" or img["location"] == location)]
-        # If filetered_images is not empty, then we chose a random image in it, else we pick the first image in sample_images
+        # If filetered_images is not empty, then we chose a random image in it, else we pick the first image in SAMPLE_PREVIEWS
         image_data = filtered_images[0]
         if not image_data:
             return jsonify({
@@ -238,7 +475,7 @@ def get_preview_image():
             }), 404
 
     # Return the image on the frontend (JSON)
-    return jsonify(image_data)
+    return preview_image_response(image_data)
 
 
 # --- JSON API : check the players' answer ---
@@ -258,11 +495,32 @@ def check_answer():
     if not validation['valid']:
         return jsonify({'error': validation['error']}), 400
     
-    # Get the image to guess, stored in the current session by /api/new-image or /api/daily-image
-    current_image = session.get('current_image', {})
+    # Prefetched round (see /api/next-images) : the round token gives the image to guess
+    round_token = data.get('round')
+    if round_token:
+        hunt_round = load_round(round_token)
+        if hunt_round is None:
+            # The frontend drops its queued rounds and asks for a new image
+            return jsonify({'error': 'Unknown, expired or already played round', 'round_expired': True}), 400
+        # The round becomes the current image (needed to rate it), it can't be played again (nor the previous
+        # rounds of its difficulty) and the player's deck continues after its image
+        session['current_image_id'] = hunt_round['id']
+        rounds = dict(session.get('rounds', {}))
+        rounds[hunt_round['difficulty']] = hunt_round['number'] + 1
+        session['rounds'] = rounds
+        save_deck(hunt_round['difficulty'], hunt_round['deck'])
+        # Pending rounds of the sessions from before the signed round tokens
+        session.pop('pending_rounds', None)
+
+    # Get the id of the image to guess, stored in the current session by /api/new-image, /api/daily-image or the round token
+    current_image_id = session.get('current_image_id')
     # If the image is not found
-    if not current_image:
+    if current_image_id is None:
         return jsonify({'error': 'No image in the current session'}), 400
+    # Answer (realm, area, location) of the image, from the answer index
+    current_image = get_answer(current_image_id)
+    if not current_image:
+        return jsonify({'error': 'Unknown image in the current session'}), 400
     
     # Points/score calculation using the scoring logic
     points = game_logic.calculate_score(
@@ -305,13 +563,16 @@ def submit_rating():
         return jsonify({'error': 'Invalid rating number, must be int between 1 and 5'}), 400
 
     if db_manager:
-        img = session["current_image"]
-        img_id = None
-        if img:
-            img_id = img["id"]
+        img_id = session.get("current_image_id")
         if img_id is None:
             print("error: invalid or missing data for current img")
             return jsonify({'error': 'Invalid or missing data for current img'}), 400
+        if rating_buffer:
+            # The vote is only queued, the background thread writes it
+            if rating_buffer.add(img_id, int(rating)):
+                return jsonify({})
+            print("error: rating buffer is full, vote dropped")
+            return jsonify({'error': 'Too many ratings at the moment, please try again later'}), 503
         success = db_manager.add_rating(img_id, int(rating))
         if success:
             return jsonify({})
@@ -323,14 +584,124 @@ def submit_rating():
         return jsonify({'error': 'Invalid or missing database connection'}), 400
 
 
+# --- JSON API : all the preview images at once ---
+
+# GET /api/preview-manifest
+@app.route('/api/preview-manifest')
+def get_preview_manifest():
+    """
+    API to get the URLs of all the preview images in one document : {"version", "realm": {"realm": url},
+    "area": {"realm > area": url}, "location": {"realm > area > location": url}}.
+    The frontend resolves the previews locally instead of calling /api/preview-image for each click.
+    The manifest is rebuilt at most every PREVIEW_MANIFEST_MIN_TTL seconds, even when PREVIEW_CACHE_TTL is lower
+    (0 queries each preview, but the manifest needs the whole table).
+    """
+    if db_manager:
+        previews = db_manager.previews
+        ttl = max(previews.ttl, getattr(config, 'PREVIEW_MANIFEST_MIN_TTL', 60))
+        if previews.is_stale(ttl):
+            db_manager.refresh_previews(ttl=ttl)
+    else:
+        previews = SAMPLE_PREVIEW_CACHE
+
+    response = jsonify(previews.manifest)
+    response.cache_control.public = True
+    response.cache_control.max_age = getattr(config, 'PREVIEW_MAX_AGE', 3600)
+    response.set_etag(previews.version)
+    return response.make_conditional(request)
+
+# --- Image proxy : the images and their variants served from the local disk cache ---
+
+def proxy_response(key, url):
+    """
+    Response of the image proxy : the image of a key of the disk cache, downloaded from its origin URL if needed.
+
+    Returns:
+        Response: the image, 502 if it could not be downloaded
+    """
+    # The file may be evicted by another worker between fetch and send_file : it is then a miss, fetched again
+    for attempt in range(2):
+        try:
+            path = image_cache.fetch(key, url)
+        except httpx.HTTPError as e:
+            print(f"Error while downloading the image {key} : {e}")
+            return jsonify({'error': f'The image {key} could not be downloaded'}), 502
+        try:
+            response = send_file(path, conditional=True, etag=True, max_age=getattr(config, 'IMAGE_PROXY_MAX_AGE', 31536000))
+            break
+        except FileNotFoundError:
+            if attempt == 1:
+                raise
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# GET /img/<id>
+@app.route('/img/<int:image_id>')
+def proxy_image(image_id):
+    """
+    Serve the original of an image from the local disk cache, downloaded from its origin on the first request.
+    Conditional (If-None-Match) and range requests are supported, the browsers keep the image for IMAGE_PROXY_MAX_AGE seconds.
+    """
+    if not image_cache:
+        return jsonify({'error': 'The image proxy is disabled'}), 404
+
+    if db_manager:
+        url = db_manager.get_image_url(game_logic, image_id)
+    else:
+        url = SAMPLE_ANSWERS.get(image_id, {}).get('url')
+    if not url:
+        return jsonify({'error': f'Unknown image {image_id}'}), 404
+    return proxy_response(image_id, url)
+
+# GET /img/<id>/<width>.<format>
+@app.route('/img/<int:image_id>/<int:width>.<any(webp, avif):format>')
+def proxy_variant(image_id, width, format):
+    """Serve a resized variant of an image (see image-variants) from the local disk cache, like proxy_image"""
+    if not image_cache:
+        return jsonify({'error': 'The image proxy is disabled'}), 404
+
+    url = db_manager.get_image_url(game_logic, image_id, format, width) if db_manager else None
+    if not url:
+        return jsonify({'error': f'Unknown variant {width}.{format} of the image {image_id}'}), 404
+    return proxy_response(f"{image_id}-{width}-{format}", url)
+
 # --- JSON API : avalaible locations list ---
 
+# The payload is built once at startup, with its pre-compressed bodies (brotli only if the module is installed)
+LOCATIONS_BODIES = {'gzip': gzip.compress(location_index.payload, compresslevel=9, mtime=0)}
+try:
+    import brotli
+    LOCATIONS_BODIES['br'] = brotli.compress(location_index.payload)
+except ImportError:
+    pass
+
 # Get /api/locations
 @app.route('/api/locations')
 def get_locations():
-    """API to obtain the list of all the locations in Sky"""
+    """
+    API to obtain the list of all the locations in Sky.
+    The response is cached by the browsers : for a year (immutable) when requested with the current version
+    (/api/locations?v=<version>), else revalidated with its ETag (304 if unchanged).
+    """
     # Expose the structure of the locations list in the frontend
-    return jsonify(locations)
+    response = current_app.response_class(location_index.payload, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(list(LOCATIONS_BODIES))
+    if encoding:
+        response.set_data(LOCATIONS_BODIES[encoding])
+        response.content_encoding = encoding
+        response.set_etag(location_index.version+"-"+encoding)
+    else:
+        response.set_etag(location_index.version)
+
+    if request.args.get('v') == location_index.version:
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # --- JSON API : reset the score to 0 ---
 
@@ -341,6 +712,75 @@ def reset_score():
     session['score'] = 0
     return jsonify({'score': 0})
 
+# --- JSON API : metrics of the worker ---
+
+# GET /api/metrics
+@app.route('/api/metrics')
+def get_metrics():
+    """Supabase connection metrics (startup timings, token refreshes), ratings, page and image cache counters of this worker"""
+    return jsonify({
+        'database': db_manager.metrics() if db_manager else None,
+        'ratings': rating_buffer.stats() if rating_buffer else None,
+        'pages': page_cache.stats() if page_cache else None,
+        'images': image_cache.stats() if image_cache else None
+    })
+
+# --- Command line : plan the daily pictures ---
+
+# flask --app app schedule-daily --days 30
+@app.cli.command('schedule-daily')
+@click.option('--days', default=30, help='Number of days to plan, starting today')
+def schedule_daily(days):
+    """Plan the daily pictures of the next days in the Daily_schedule table"""
+    if not db_manager:
+        print("error: invalid or missing database connection")
+        return
+    schedule = db_manager.schedule_daily_images(days)
+    for day, image_id in schedule.items():
+        print(f"{day} : image {image_id}")
+    print(f"{len(schedule)} new days planned")
+
+# --- Command line : resized variants of the images ---
+
+# flask --app app image-variants --widths 320,640,1280
+@app.cli.command('image-variants')
+@click.option('--widths', default=",".join(str(width) for width in DEFAULT_WIDTHS), help='Widths of the variants, in pixels')
+@click.option('--force', is_flag=True, help='Also regenerate the images that already have variants')
+def image_variants(widths, force):
+    """Generate the WebP (and AVIF if supported) variants of the game and preview images, and store their URLs"""
+    if not db_manager:
+        print("error: invalid or missing database connection")
+        return
+    widths = [int(width) for width in widths.split(",")]
+    for table in ["Pichunt_images", "Preview_images"]:
+        generated = 0
+        for image_id, count, error in generate_variants(db_manager, table, widths, force):
+            if error:
+                print(f"{table} {image_id} : error : {error}")
+            else:
+                print(f"{table} {image_id} : {count} variants")
+                generated += 1
+        print(f"{table} : {generated} images processed")
+
+# --- Command line : placeholders of the images ---
+
+# flask --app app image-placeholders
+@app.cli.command('image-placeholders')
+@click.option('--force', is_flag=True, help='Also recompute the images that already have a placeholder')
+def image_placeholders(force):
+    """Compute the tiny placeholder displayed while each game image is loading, and store it with the image"""
+    if not db_manager:
+        print("error: invalid or missing database connection")
+        return
+    computed = 0
+    for image_id, size, error in generate_placeholders(db_manager, force):
+        if error:
+            print(f"image {image_id} : error : {error}")
+        else:
+            print(f"image {image_id} : {size} bytes")
+            computed += 1
+    print(f"{computed} placeholders computed")
+
 # --- To run the app on a local instance ---
 
 if __name__ == '__main__':
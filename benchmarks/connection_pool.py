@@ -0,0 +1,101 @@
+"""
+p50 and p99 latency of SupabaseManager.get_random_image with the default supabase-py client and with the shared
+connection pool of create_http_client, against a local PostgREST stand-in (tests/fake_supabase.py).
+
+The catalog cache is disabled : each call runs its two queries (count of the difficulty, then one row).
+The token is refreshed every --refresh-every calls of a thread, which replaces the authorized client.
+
+Usage : python -m benchmarks.connection_pool [--threads 16] [--calls 200] [--latency 0.002] [--refresh-every 100]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+import conftest  # config.py of the tests when there is none
+import config
+from fake_supabase import FakeSupabase, PostgrestStandIn, make_images
+from supabase import create_client, ClientOptions
+from models.game import GameLogic
+from utils.database import SupabaseManager
+
+class DefaultClientManager(SupabaseManager):
+    """The client as created before the shared pool : supabase-py's own httpx client, replaced with each token"""
+
+    def authorize(self, session):
+        self.client = create_client(config.URL, config.APIkey, options=ClientOptions(headers={"Authorization": f"Bearer {session.access_token}"}))
+        self.access_token = session.access_token
+        self.token_expires_at = session.expires_at
+
+def run(manager_class, threads, calls, refresh_every):
+    """
+    Returns:
+        tuple: durations of the successful calls in milliseconds, number of failed calls
+    """
+    manager = manager_class()
+    manager.catalog.ttl = 0
+    session = SimpleNamespace(access_token="token", refresh_token="refresh", expires_at=time.time() + 3600)
+    manager.authorize(session)
+    game_logic = GameLogic()
+    durations = []
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def player():
+        barrier.wait()
+        for call in range(calls):
+            if refresh_every and call and call % refresh_every == 0:
+                manager.authorize(session)
+            start = time.perf_counter()
+            try:
+                manager.get_random_image(game_logic, "medium")
+            except Exception as e:
+                # A request still running on a replaced client may fail, it is counted instead of ending the thread
+                errors.append(e)
+                continue
+            durations.append((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=player) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return durations, len(errors)
+
+def serve(latency, connection):
+    """Run the stand-in in its own process, so that it does not share the GIL with the measured threads"""
+    stand_in = PostgrestStandIn(FakeSupabase({"Pichunt_images": make_images(300)}, latency=0), latency=latency)
+    connection.send(stand_in.url)
+    connection.recv()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16, help="concurrent threads of a worker")
+    parser.add_argument("--calls", type=int, default=200, help="calls per thread")
+    parser.add_argument("--latency", type=float, default=0.002, help="latency added by the stand-in to each response, in seconds")
+    parser.add_argument("--refresh-every", type=int, default=100, help="calls of a thread between two token refreshes (0 : never)")
+    arguments = parser.parse_args()
+
+    connection, child_connection = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(arguments.latency, child_connection), daemon=True)
+    server.start()
+    config.URL = connection.recv()
+    print(f"{arguments.threads} threads x {arguments.calls} calls, {arguments.latency * 1000:g} ms per response, "
+          f"token refreshed every {arguments.refresh_every} calls")
+    print(f"{'setup':<28}{'p50 (ms)':>10}{'p99 (ms)':>10}{'calls/s':>10}{'errors':>8}")
+    for name, manager_class in [("default supabase-py client", DefaultClientManager), ("shared connection pool", SupabaseManager)]:
+        start = time.perf_counter()
+        durations, errors = run(manager_class, arguments.threads, arguments.calls, arguments.refresh_every)
+        elapsed = time.perf_counter() - start
+        percentiles = statistics.quantiles(durations, n=100)
+        print(f"{name:<28}{percentiles[49]:>10.2f}{percentiles[98]:>10.2f}{len(durations) / elapsed:>10.0f}{errors:>8}")
+    connection.send("stop")
+    server.join()
+
+if __name__ == "__main__":
+    main()
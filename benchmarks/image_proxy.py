@@ -0,0 +1,89 @@
+"""
+Cold and warm requests of the image proxy disk cache (DiskImageCache.fetch), against a local origin, and the
+lookup of an image missing from a large cache : the directory listed (before) or the known file names checked.
+
+Usage : python -m benchmarks.image_proxy [--images 200] [--size 200000] [--latency 0.02] [--files 10000]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.image_proxy import DiskImageCache
+
+class Origin(BaseHTTPRequestHandler):
+    """Origin of the images : --size bytes of JPEG per image, after --latency seconds"""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+def scan_find(directory, key):
+    """DiskImageCache.find before the known names : the directory listed for each lookup"""
+    for entry in os.scandir(directory):
+        if entry.name.split(".")[0] == key and entry.is_file():
+            return entry.name
+    return None
+
+def timings(function, keys):
+    """
+    Returns:
+        list: duration of function(key) for each key, in milliseconds
+    """
+    durations = []
+    for key in keys:
+        start = time.perf_counter()
+        function(key)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=200, help="images requested cold then warm")
+    parser.add_argument("--size", type=int, default=200000, help="bytes of each image")
+    parser.add_argument("--latency", type=float, default=0.02, help="latency of the origin, in seconds")
+    parser.add_argument("--files", type=int, default=10000, help="files in the cache for the lookup of a missing image")
+    arguments = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    server.latency, server.body = arguments.latency, b"x" * arguments.size
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskImageCache(directory)
+        keys = list(range(1, arguments.images + 1))
+        cold = timings(lambda key: cache.fetch(key, f"{url}/{key}"), keys)
+        warm = timings(lambda key: cache.fetch(key, f"{url}/{key}"), keys)
+        # Another worker : its hints are empty, each first request looks the file up on the disk
+        other = DiskImageCache(directory)
+        warm_other = timings(lambda key: other.fetch(key, f"{url}/{key}"), keys)
+
+        # Missing images in a directory of --files images
+        for index in range(arguments.files):
+            open(os.path.join(directory, f"{100000 + index}.jpg"), "wb").close()
+        missing = [f"missing-{index}" for index in range(200)]
+        scan_missing = timings(lambda key: scan_find(directory, key), missing)
+        known_missing = timings(cache.find, missing)
+    server.shutdown()
+
+    print(f"{arguments.images} images of {arguments.size} bytes, origin latency {arguments.latency * 1000:g} ms")
+    print(f"{'request':<44}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for name, durations in [("cold (downloaded from the origin)", cold), ("warm (same worker)", warm),
+                            ("warm (another worker)", warm_other),
+                            (f"missing, directory listed ({arguments.files} files)", scan_missing),
+                            (f"missing, known names ({arguments.files} files)", known_missing)]:
+        percentiles = statistics.quantiles(durations, n=100)
+        print(f"{name:<44}{percentiles[49]:>10.3f}{percentiles[98]:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Time to validate and score a million answers, with the locations dict walked and the names compared (before the
+location index) and with the lookups of the location index (GameLogic.validate_selection and calculate_score).
+
+The answers are synthetic : a right answer drawn among the valid answers of the locations tree, and a selection
+which is the right answer, another answer of the same area, of the same realm, or any valid answer.
+
+Usage : python -m benchmarks.location_index [--answers 1000000]
+"""
+import argparse
+import random
+import time
+from models.game import GameLogic
+from models.locations import locations
+from models.location_index import location_index
+
+def names_validate_selection(realm, area, location):
+    """validate_selection before the location index : the locations dict walked level by level"""
+    if not realm:
+        return {'valid': False, 'error': 'Please select a valid realm.'}
+    if realm not in locations:
+        return {'valid': False, 'error': 'Invalid realm.'}
+    if not area:
+        return {'valid': False, 'error': 'Please select a valid area.'}
+    if area not in locations[realm]:
+        return {'valid': False, 'error': 'Invalid area for this realm.'}
+    if not location:
+        if not locations[realm][area]:
+            return {'valid': True}
+        return {'valid': False, 'error': 'Please select a valid location.'}
+    if location not in locations[realm][area]:
+        return {'valid': False, 'error': 'Invalid location for this area.'}
+    return {'valid': True}
+
+def names_calculate_score(score_system, correct_answer, selected_realm, selected_area, selected_location):
+    """calculate_score before the location index : the names compared level by level"""
+    score = 0
+    if selected_realm == correct_answer.get('realm', ''):
+        score += score_system['realm']
+    if selected_area == correct_answer.get('area', '') and score > 0:
+        score += score_system['area']
+    correct_location = correct_answer.get('location', '')
+    if score >= score_system['realm'] + score_system['area']:
+        if correct_location:
+            if selected_location == correct_location:
+                score += score_system['location']
+        elif not locations[selected_realm][selected_area]:
+            score += score_system['location']
+    return score
+
+def make_answers(count, seed=0):
+    """
+    Returns:
+        list: (right answer dict, selected realm, selected area, selected location)
+    """
+    generator = random.Random(seed)
+    valid = sorted(location_index.valid)
+    by_area, by_realm = {}, {}
+    for path in valid:
+        by_area.setdefault(path[:2], []).append(path)
+        by_realm.setdefault(path[0], []).append(path)
+    answers = []
+    for _ in range(count):
+        right = generator.choice(valid)
+        selected = generator.choice([right, generator.choice(by_area[right[:2]]), generator.choice(by_realm[right[0]]), generator.choice(valid)])
+        answers.append(({'realm': right[0], 'area': right[1], 'location': right[2]}, *selected))
+    return answers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--answers", type=int, default=1000000, help="number of answers validated and scored")
+    arguments = parser.parse_args()
+
+    game_logic = GameLogic()
+    answers = make_answers(arguments.answers)
+
+    implementations = [
+        ("locations dict + names", names_validate_selection, lambda answer, *selected: names_calculate_score(game_logic.score_system, answer, *selected)),
+        ("location index", game_logic.validate_selection, game_logic.calculate_score)
+    ]
+    results = []
+    for name, validate_selection, calculate_score in implementations:
+        start = time.perf_counter()
+        valid = [validate_selection(*selected)['valid'] for answer, *selected in answers]
+        validate_time = time.perf_counter() - start
+        start = time.perf_counter()
+        points = [calculate_score(answer, *selected) for answer, *selected in answers]
+        score_time = time.perf_counter() - start
+        results.append((name, validate_time, score_time, valid, points))
+
+    # Same validation and same points with both implementations
+    assert results[0][3:] == results[1][3:]
+    print(f"{len(answers)} answers, {len(location_index.valid)} valid answers in the locations tree")
+    print(f"{'implementation':<28}{'validate (s)':>14}{'score (s)':>11}{'per answer (us)':>17}")
+    for name, validate_time, score_time, valid, points in results:
+        print(f"{name:<28}{validate_time:>14.2f}{score_time:>11.2f}{(validate_time + score_time) / len(answers) * 1e6:>17.2f}")
+
+if __name__ == "__main__":
+    main()
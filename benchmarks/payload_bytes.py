@@ -0,0 +1,105 @@
+"""
+Bytes of the PostgREST responses read by each endpoint, with the column sets of SupabaseManager and with select('*').
+
+The queries run through the real supabase-py client against a local PostgREST stand-in (tests/fake_supabase.py)
+holding synthetic rows with all the columns of Pichunt_images and Preview_images. The caches are disabled so that
+each endpoint runs its queries.
+
+Usage : python -m benchmarks.payload_bytes [--images 500] [--wide 2000]
+    --wide adds a column of this many bytes to the rows (e.g. EXIF data, moderation notes) : it only travels with select('*')
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+import conftest  # config.py of the tests when there is none
+import config
+from fake_supabase import FakeSupabase, PostgrestStandIn
+from models.game import GameLogic
+from utils.database import SupabaseManager
+
+def make_tables(images, wide):
+    """Synthetic rows with the columns of the production tables"""
+    storage = "https://abcdefghijklmnop.supabase.co/storage/v1/object/public"
+    variants = lambda table, i: {format: {str(width): f"{storage}/variants/{table}/{i}/{width}.{format}" for width in (320, 640, 1280)}
+                                 for format in ("webp", "avif")}
+    today = date.today()
+    pichunt_images = [{
+        "id": i,
+        "created_at": "2025-06-01T12:00:00.000000+00:00",
+        "image": f"{storage}/pictures/{i:05d}-0f6b1c2e9a.jpg",
+        "variants": variants("Pichunt_images", i),
+        "placeholder": "data:image/webp;base64," + "A" * 160,
+        "realm": "Daylight Prairie",
+        "area": "Butterfly Fields",
+        "location": "Prairie Caves" if i % 2 else None,
+        "difficulty": (i % 100) / 100,
+        "rating_count": i % 40,
+        # Half of the images already appeared as daily image
+        "appeared": (today - timedelta(days=i)).isoformat() if i % 2 else None,
+        **({"notes": "x" * wide} if wide else {})
+    } for i in range(1, images + 1)]
+    preview_images = [{
+        "id": i,
+        "created_at": "2025-06-01T12:00:00.000000+00:00",
+        "URL": f"{storage}/previews/{i:05d}-3d9e7a1b.jpg",
+        "variants": variants("Preview_images", i),
+        "Type": "Realm" if i == 1 else "Area",
+        "Realm": "Daylight Prairie",
+        "Area": None if i == 1 else f"Area {i}",
+        "Location": None,
+        **({"notes": "x" * wide} if wide else {})
+    } for i in range(1, 41)]
+    return {"Pichunt_images": pichunt_images, "Preview_images": preview_images, "Daily_schedule": []}
+
+def measure(images, wide, all_columns):
+    """
+    Returns:
+        dict: {endpoint: bytes of the PostgREST responses read by one call}
+    """
+    stand_in = PostgrestStandIn(FakeSupabase(make_tables(images, wide), latency=0))
+    config.URL = stand_in.url
+    manager = SupabaseManager()
+    manager.catalog.ttl = 0
+    manager.previews.ttl = 0
+    manager.authorize(SimpleNamespace(access_token="token", refresh_token="refresh", expires_at=time.time() + 3600))
+    if all_columns:
+        manager.IMAGE_COLUMNS = manager.DAILY_COLUMNS = manager.PREVIEW_COLUMNS = manager.ANSWER_COLUMNS = "*"
+    game_logic = GameLogic()
+
+    endpoints = {
+        "/api/new-image (catalog cache off)": lambda: manager.get_random_image(game_logic, "medium"),
+        "/api/daily-image (first call of the day)": manager.get_supabase_daily,
+        "/api/preview-image (preview cache off)": lambda: manager.get_preview_image("realm", "Daylight Prairie"),
+        "/api/check-answer (answer index miss)": lambda: manager.get_answer(game_logic, 7),
+        "image catalog reload (every worker)": lambda: manager.select_all("Pichunt_images", manager.IMAGE_COLUMNS),
+        "preview manifest reload (every worker)": lambda: manager.select_all("Preview_images", manager.PREVIEW_COLUMNS),
+    }
+    results = {}
+    for endpoint, call in endpoints.items():
+        before = sum(stand_in.bytes_sent.values())
+        call()
+        results[endpoint] = sum(stand_in.bytes_sent.values()) - before
+    stand_in.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=500, help="number of rows of Pichunt_images")
+    parser.add_argument("--wide", type=int, default=0, help="bytes of an additional wide column")
+    arguments = parser.parse_args()
+
+    projected = measure(arguments.images, arguments.wide, all_columns=False)
+    everything = measure(arguments.images, arguments.wide, all_columns=True)
+    print(f"{arguments.images} images, wide column of {arguments.wide} bytes")
+    print(f"{'endpoint':<44}{'select(*)':>12}{'column sets':>14}{'saved':>8}")
+    for endpoint in projected:
+        saved = 1 - projected[endpoint] / everything[endpoint] if everything[endpoint] else 0
+        print(f"{endpoint:<44}{everything[endpoint]:>12,}{projected[endpoint]:>14,}{saved:>8.0%}")
+
+if __name__ == "__main__":
+    main()
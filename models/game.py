@@ -1,5 +1,5 @@
 import random
-from models.locations import locations
+from models.location_index import location_index
 
 class GameLogic:
     """Sky Picture Hunt game's logic management"""
@@ -11,6 +11,7 @@ class GameLogic:
             'area': 200,
             'location': 300
         }
+        self.perfect_score = sum(self.score_system.values())
     
     def calculate_score(self, correct_answer, selected_realm, selected_area, selected_location):
         """
@@ -25,22 +26,26 @@ class GameLogic:
         Returns:
             Score (int): total of points
         """
-        score = 0
-        
-        # Realm verification
-        # .get provides a protection if the key is absent from correct_answer
-        if selected_realm == correct_answer.get('realm', ''):
-            score += self.score_system['realm'] # If the realm is right, we add the according points to the score
-        
-        # Area verification (only if the realm was right : score is already > 0)
-        if selected_area == correct_answer.get('area', '') and score > 0:
-            score += self.score_system['area']
-        
-        # Location verification (only if the realm and area were right and if there exist a location for this area and realm)
-        correct_location = correct_answer.get('location', '')
-        if (correct_location and 
-            selected_location == correct_location and 
-            score >= self.score_system['realm'] + self.score_system['area']):
+        # Lineages (node ids of the realm, area and location) of the right answer and of the player's answer :
+        # each level counts only if the levels above it are right, so the points are given by the common prefix.
+        # The complete answers are found with a single lookup, the other paths through LocationIndex.lineage
+        correct_path = (correct_answer.get('realm', ''), correct_answer.get('area', ''), correct_answer.get('location', '') or "")
+        correct = location_index.answer_lineages.get(correct_path) or location_index.lineage(*correct_path)
+        selected = location_index.answer_lineages.get((selected_realm, selected_area, selected_location)) or location_index.lineage(selected_realm, selected_area, selected_location)
+        if correct is selected and len(correct) == 3:
+            return self.perfect_score
+        if not correct or not selected or correct[0] != selected[0]:
+            return 0
+        score = self.score_system['realm']
+        if len(correct) < 2 or len(selected) < 2 or correct[1] != selected[1]:
+            return score
+        score += self.score_system['area']
+
+        # For a leaf area (no sub-locations), the right area is the most precise answer : it gets the location points too
+        if len(correct) == 3:
+            if len(selected) == 3 and correct[2] == selected[2]:
+                score += self.score_system['location']
+        elif location_index.is_leaf(selected_realm, selected_area):
             score += self.score_system['location']
         
         return score
@@ -52,34 +57,32 @@ class GameLogic:
         Args:
             realm (str): selected realm
             area (str): selected area
-            location (str): selected location
+            location (str): selected location ("" for a leaf area, without sub-locations)
             
         Returns:
             dict: result of the validation, respects the structure {'valid': bool, 'error':'message' (optionnal)}
         """
+        # Fast path : a complete and valid answer is a single hash lookup
+        if (realm, area, location) in location_index.valid:
+            return {'valid': True}
+
+        # Else look for the first missing or invalid level, to explain the error
         if not realm:
             return {'valid': False, 'error': 'Please select a valid realm.'}
         
-        if realm not in locations:
+        if location_index.node_id(realm) is None:
             return {'valid': False, 'error': 'Invalid realm.'}
         
         # Checking if an area is given
-        if area:            
-            if area not in locations[realm]:
-                return {'valid': False, 'error': 'Invalid area for this realm.'}
-        else:
+        if not area:
             return {'valid': False, 'error': 'Please select a valid area.'}
+        if location_index.node_id(realm, area) is None:
+            return {'valid': False, 'error': 'Invalid area for this realm.'}
         
-        # Checking if a location is given
-        if location:
-            possible_locations = locations[realm][area] # List of the possible locations for this area
-            if location not in possible_locations:
-                return {'valid': False, 'error': 'Invalid location for this area.'}
-        else:
+        # Checking if a location is given (leaf areas have none, they are accepted by the fast path)
+        if not location:
             return {'valid': False, 'error': 'Please select a valid location.'}
-        
-        # If all the checks have been passed
-        return {'valid': True}
+        return {'valid': False, 'error': 'Invalid location for this area.'}
     
     def get_difficulty_settings(self, difficulty):
         """
@@ -125,6 +128,57 @@ class GameLogic:
         
         return settings.get(difficulty_name, settings['easy'])
 
+    def draw_from_deck(self, deck, size, fingerprint=None):
+        """
+        Draw the next image of a player's deck : a shuffled order of the images of a bucket, without repetition
+        until all the images have been drawn. The deck only stores a seed and a cursor (constant size whatever the
+        number of images), a new order is drawn when the deck is exhausted or when the bucket changes : other size,
+        or other fingerprint when the bucket has one (images replaced without changing the size).
+
+        Args:
+            deck (dict): state of the deck {'seed', 'cursor', 'size', 'fingerprint'}, updated in place (empty dict for a new deck)
+            size (int): number of images in the bucket
+            fingerprint (str|None): hash of the ids of the bucket (see ImageCatalogCache), None if unknown
+
+        Returns:
+            int: index of the drawn image in the bucket (ordered by id)
+        """
+        if deck.get('size') != size or deck.get('fingerprint') != fingerprint or deck.get('cursor', 0) >= size:
+            deck['seed'] = random.getrandbits(32)
+            deck['cursor'] = 0
+            deck['size'] = size
+            deck['fingerprint'] = fingerprint
+        index = self.shuffled_index(deck['seed'], deck['cursor'], size)
+        deck['cursor'] += 1
+        return index
+
+    def shuffled_index(self, seed, position, size):
+        """
+        Element at a position of a pseudo-random permutation of range(size) defined by the seed, in O(1)
+        without building the permutation : a 4-round Feistel network on the smallest even number of bits
+        covering size, applied again while the result is out of range (cycle walking).
+
+        Returns:
+            int: the element, between 0 and size - 1
+        """
+        if size <= 1:
+            return 0
+        half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        mask = (1 << half_bits) - 1
+        value = position
+        while True:
+            left, right = value >> half_bits, value & mask
+            for round_number in range(4):
+                # Integer hash of the right half, the seed and the round
+                h = (right * 0x9E3779B1 + seed * 0x85EBCA6B + round_number * 0xC2B2AE35) & 0xFFFFFFFF
+                h ^= h >> 15
+                h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+                h ^= h >> 12
+                left, right = right, left ^ (h & mask)
+            value = (left << half_bits) | right
+            if value < size:
+                return value
+
     def get_difficulty_range(self, difficulty):
         if difficulty.lower() == "easy":
             return (0.0, 0.33)
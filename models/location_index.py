@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sys
+from models.locations import locations
+
+class LocationIndex:
+    """
+    Compiled, read-only index of the locations tree, built once at import.
+    Each realm, area and location is a node with an integer id (stable across processes, the locations of an
+    area being numbered in alphabetical order), a path (realm, area, location) and a lineage (the ids of its
+    realm, area and location) used to score the answers.
+    Areas without sub-locations (e.g. "Isle Temple" : {}) are leaf areas : the area is the complete answer,
+    with an empty location.
+    """
+
+    def __init__(self, tree):
+        """
+        Args:
+            tree (dict): the locations tree {realm: {area: {location}}}
+        """
+        # Node id -> path (realm,) / (realm, area) / (realm, area, location)
+        self.paths = []
+        # Node id -> ids of the nodes from its realm down to it : (realm,) / (realm, area) / (realm, area, location)
+        self.lineages = []
+        # Path -> node id
+        self.ids = {}
+        # (realm, area) of the areas without sub-locations
+        leaf_areas = set()
+
+        for realm, areas in tree.items():
+            realm_id = self.add((realm,), None)
+            for area, area_locations in areas.items():
+                area_id = self.add((realm, area), realm_id)
+                if not area_locations:
+                    leaf_areas.add(self.paths[area_id])
+                for location in sorted(area_locations):
+                    self.add((realm, area, location), area_id)
+
+        self.leaf_areas = frozenset(leaf_areas)
+        # Complete and valid answers (realm, area, location), the location of a leaf area being ""
+        self.valid = frozenset([path for path in self.paths if len(path) == 3] + [(realm, area, "") for realm, area in self.leaf_areas])
+        # Complete answer -> lineage of its node : a single lookup for the answers of the players
+        self.answer_lineages = {answer: self.lineages[self.ids[answer if answer[2] else answer[:2]]] for answer in self.valid}
+
+        # Canonical JSON of the tree for the frontend (the sets of locations become sorted lists, the realms and
+        # areas keep their order) and its version : the hash of the content, it only changes with the tree
+        self.payload = json.dumps({realm: {area: sorted(area_locations) for area, area_locations in areas.items()}
+                                   for realm, areas in tree.items()},
+                                  ensure_ascii=False, separators=(',', ':')).encode()
+        self.version = hashlib.sha256(self.payload).hexdigest()[:16]
+
+    def add(self, path, parent_id):
+        """
+        Add a node to the index, its names are interned (identical strings share one object).
+
+        Returns:
+            int: id of the new node
+        """
+        path = tuple(sys.intern(name) for name in path)
+        node_id = len(self.paths)
+        self.paths.append(path)
+        self.lineages.append((self.lineages[parent_id] if parent_id is not None else ()) + (node_id,))
+        self.ids[path] = node_id
+        return node_id
+
+    def node_id(self, *path):
+        """
+        Returns:
+            int|None: id of the node of a path (realm[, area[, location]]), None if the path does not exist
+        """
+        return self.ids.get(path)
+
+    def is_leaf(self, realm, area):
+        """
+        Returns:
+            bool: True if the area exists and has no sub-locations
+        """
+        return (realm, area) in self.leaf_areas
+
+    def lineage(self, realm, area="", location=""):
+        """
+        Lineage of the deepest existing node of a path : an unknown location gives the lineage of its area,
+        an unknown area the one of its realm.
+
+        Returns:
+            tuple: ids of the nodes (realm[, area[, location]]), empty if the realm does not exist
+        """
+        node_id = self.ids.get((realm, area, location))
+        if node_id is None:
+            node_id = self.ids.get((realm, area))
+            if node_id is None:
+                node_id = self.ids.get((realm,))
+                if node_id is None:
+                    return ()
+        return self.lineages[node_id]
+
+# Index of the Sky locations, shared by the whole application
+location_index = LocationIndex(locations)
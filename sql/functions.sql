@@ -0,0 +1,40 @@
+-- Postgres functions called by SupabaseManager through supabase.rpc()
+-- Run this script in the Supabase SQL editor after each change
+
+-- Add a player's rating (1 to 5) to the running mean of the picture's difficulty.
+-- The rating is mapped to the difficulty scale with 0.25*rating-0.25 (1 -> 0.0, 5 -> 1.0).
+-- The update is a single statement : concurrent votes on the same picture are serialized by the row lock.
+create or replace function add_rating(picture_id bigint, rating integer)
+returns table (difficulty double precision, rating_count integer)
+language sql
+as $$
+    update "Pichunt_images" as img
+       set difficulty = (img.difficulty * img.rating_count + (0.25 * rating - 0.25)) / (img.rating_count + 1),
+           rating_count = img.rating_count + 1
+     where img.id = picture_id
+ returning img.difficulty::double precision, img.rating_count::integer;
+$$;
+
+-- Apply a batch of aggregated ratings, as sent by utils/rating_buffer.py :
+-- deltas = [{"id": picture id, "sum": sum of the ratings, "count": number of ratings}, ...]
+-- Each picture is updated once, with the same mapping as add_rating. Returns the number of updated pictures.
+create or replace function add_ratings(deltas jsonb)
+returns integer
+language sql
+as $$
+    with delta as (
+        select (elem->>'id')::bigint as id,
+               (elem->>'sum')::double precision as rating_sum,
+               (elem->>'count')::integer as rating_count
+          from jsonb_array_elements(deltas) as elem
+    ), updated as (
+        update "Pichunt_images" as img
+           set difficulty = (img.difficulty * img.rating_count + (0.25 * delta.rating_sum - 0.25 * delta.rating_count))
+                            / (img.rating_count + delta.rating_count),
+               rating_count = img.rating_count + delta.rating_count
+          from delta
+         where img.id = delta.id
+     returning img.id
+    )
+    select count(*)::integer from updated;
+$$;
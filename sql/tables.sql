@@ -0,0 +1,15 @@
+-- Tables used by SupabaseManager, in addition to Pichunt_images and Preview_images
+-- Run this script in the Supabase SQL editor after each change
+
+-- Planned daily images : filled in advance by `flask --app app schedule-daily`
+create table if not exists "Daily_schedule" (
+    day date primary key,
+    image_id bigint not null references "Pichunt_images"(id) on delete cascade
+);
+
+-- Resized variants of the images : {"webp": {"320": url, ...}, "avif": {...}}, filled by `flask --app app image-variants`
+alter table "Pichunt_images" add column if not exists variants jsonb;
+alter table "Preview_images" add column if not exists variants jsonb;
+
+-- Tiny placeholder of the images (data URI of a few hundred bytes), filled by `flask --app app image-placeholders`
+alter table "Pichunt_images" add column if not exists placeholder text;
@@ -10,7 +10,19 @@ export async function loadImageFromJson(endpointUrl, imgSelector, urlFieldName="
             throw new Error("Network error: "+res.status);
         }
         const data = await res.json();
+        displayImageData(data, imgSelector, urlFieldName, hideUponError, diffcTextID);
+    } catch (err) {
+        console.error("loadImageFromJson error:", err);
+        img?.closest(".image-container")?.classList?.add("error");
+    }
+}
+
+//displaying an image (and its difficulty) from already fetched data
+export function displayImageData(data, imgSelector, urlFieldName="url", hideUponError=false, diffcTextID=null){
+    const img = document.querySelector(imgSelector);
+    if (!img) return console.error("Image element not found:", imgSelector);
 
+    try{
         const ImageUrl = Array.isArray(data) ? data[0]?.[urlFieldName] : data?.[urlFieldName];
 
         //displaying difficulty
@@ -28,20 +40,99 @@ export async function loadImageFromJson(endpointUrl, imgSelector, urlFieldName="
             throw new Error("No image URL found in response");
         }
 
+        //tiny placeholder (see the image-placeholders command), displayed until the image is loaded
+        const placeholder = Array.isArray(data) ? data[0]?.["placeholder"] : data?.["placeholder"];
+        if (placeholder)
+            showPlaceholder(img, placeholder);
+
         img.addEventListener("load", ()=> {
             img.closest(".image-container")?.classList?.add("loaded");
+            hidePlaceholder(img);
         }, {once: true});
 
         img.addEventListener("error", ()=> {
             img.closest(".image-container")?.classList?.add("error");
             console.error("Failed to load image:", ImageUrl);
+            hidePlaceholder(img);
             if (hideUponError)
                 img.classList.add("hidden");
         }, {once: true});
 
+        //resized variants (see the image-variants command): the browser picks the one matching the sizes attribute of the <img>
+        const srcset = Array.isArray(data) ? data[0]?.["srcset"] : data?.["srcset"];
+        if (srcset)
+            img.srcset = srcset;
+        else
+            img.removeAttribute("srcset");
         img.src = ImageUrl;
     } catch (err) {
-        console.error("loadImageFromJson error:", err);
+        console.error("displayImageData error:", err);
         img?.closest(".image-container")?.classList?.add("error");
     }
+}
+
+//the placeholder is stretched in the background of the <img>, which gets the aspect ratio of the image meanwhile
+function showPlaceholder(img, placeholder){
+    img.style.backgroundImage = "url(\""+placeholder+"\")";
+    img.style.backgroundSize = "cover";
+    const tiny = new Image();
+    tiny.addEventListener("load", ()=> {
+        if (img.style.backgroundImage)
+            img.style.aspectRatio = tiny.naturalWidth+" / "+tiny.naturalHeight;
+    }, {once: true});
+    tiny.src = placeholder;
+}
+
+function hidePlaceholder(img){
+    img.style.removeProperty("background-image");
+    img.style.removeProperty("background-size");
+    img.style.removeProperty("aspect-ratio");
+}
+
+//sizes of #game-image (max-w-2xl), to preload the same variant as the one that will be displayed
+const GAME_IMAGE_SIZES = "(max-width: 672px) 100vw, 672px";
+
+//preloading an image (or the variant of its srcset matching sizes) in the browser cache
+export function preloadImage(url, srcset="", sizes=GAME_IMAGE_SIZES){
+    if (!url) return;
+    const img = new Image();
+    if (srcset){
+        img.sizes = sizes;
+        img.srcset = srcset;
+    }
+    img.src = url;
+}
+
+//next round of the hunt: rounds are prefetched by batches from /api/next-images and kept in the sessionStorage
+//(it survives the page reload of the "Next image" button), their images are preloaded while the current one is played
+export async function nextHuntRound(difficulty, batchSize=3){
+    const key = "hunt-rounds-"+difficulty;
+    let queue = JSON.parse(sessionStorage.getItem(key) || "[]");
+    if (queue.length == 0)
+        queue = await fetchHuntRounds(difficulty, batchSize);
+    const round = queue.shift();
+    sessionStorage.setItem(key, JSON.stringify(queue));
+
+    queue.forEach(r => preloadImage(r.url, r.srcset));
+    //refilling the queue in the background before it is empty, with the rounds following the last queued one
+    if (queue.length <= 1){
+        const last = queue.length ? queue[queue.length-1] : round;
+        fetchHuntRounds(difficulty, batchSize, last.round).then(rounds => {
+            const current = JSON.parse(sessionStorage.getItem(key) || "[]");
+            sessionStorage.setItem(key, JSON.stringify(current.concat(rounds)));
+            rounds.forEach(r => preloadImage(r.url, r.srcset));
+        }).catch(err => console.error("nextHuntRound prefetch error:", err));
+    }
+    return round;
+}
+
+//drop the prefetched rounds of a difficulty (e.g. when the server no longer knows them)
+export function resetHuntRounds(difficulty){
+    sessionStorage.removeItem("hunt-rounds-"+difficulty);
+}
+
+async function fetchHuntRounds(difficulty, batchSize, after=""){
+    const res = await fetch("/api/next-images?difficulty="+difficulty+"&n="+batchSize+"&after="+encodeURIComponent(after), {cache: "no-store"});
+    if (!res.ok) throw new Error("Network error: "+res.status);
+    return await res.json();
 }
\ No newline at end of file
@@ -0,0 +1,40 @@
+//preview images of the realms, areas and locations: the manifest (/api/preview-manifest) holds all their URLs,
+//the previews are resolved locally instead of calling /api/preview-image for each click
+export async function loadPreviewManifest(){
+    const res = await fetch("/api/preview-manifest");
+    if (!res.ok) throw new Error("Network error: "+res.status);
+    return await res.json();
+}
+
+//URL of the preview of a realm, area or location (type), null if there is none
+export function previewUrl(manifest, type, realm, area="", location=""){
+    const key = [realm, area, location].filter(name => name != "").join(" > ");
+    return manifest?.[type]?.[key] ?? null;
+}
+
+//srcset of the resized variants of a preview, "" if it has none
+export function previewSrcset(manifest, type, realm, area="", location=""){
+    const key = [realm, area, location].filter(name => name != "").join(" > ");
+    return manifest?.srcset?.[type]?.[key] ?? "";
+}
+
+//sizes of the preview <img> (200px high)
+const PREVIEW_SIZES = "300px";
+
+//warming the browser cache with the previews of the areas of a realm
+export function preloadRealmPreviews(manifest, realm){
+    const prefix = realm+" > ";
+    for (const [key, url] of Object.entries(manifest?.area ?? {})){
+        if (!key.startsWith(prefix) || document.querySelector("link[rel=preload][href=\""+CSS.escape(url)+"\"]")) continue;
+        const link = document.createElement("link");
+        link.rel = "preload";
+        link.as = "image";
+        link.href = url;
+        const srcset = manifest.srcset?.area?.[key];
+        if (srcset){
+            link.imageSrcset = srcset;
+            link.imageSizes = PREVIEW_SIZES;
+        }
+        document.head.append(link);
+    }
+}
@@ -0,0 +1,66 @@
+//building the location tree of the sidebar from the locations asset (/api/locations?v=<version>):
+//the browser downloads the tree once per version, the page only holds an empty container
+export async function loadLocations(locationsUrl){
+    const res = await fetch(locationsUrl);
+    if (!res.ok) throw new Error("Network error: "+res.status);
+    return await res.json();
+}
+
+function makeElement(tag, className, attributes={}){
+    const element = document.createElement(tag);
+    element.className = className;
+    for (const [name, value] of Object.entries(attributes))
+        element.setAttribute(name, value);
+    return element;
+}
+
+function makeChevron(className){
+    return makeElement("i", className+" transform transition-transform", {"data-lucide": "chevron-right"});
+}
+
+//tree: {realm: {area: [locations]}}, an area without locations is a leaf area (complete answer)
+//handlers: {realm(realm), area(area, isLeaf), location(location)} called on click
+export function buildSidebar(container, tree, handlers){
+    const fragment = document.createDocumentFragment();
+    for (const [realm, areas] of Object.entries(tree)){
+        const realmDiv = makeElement("div", "mb-2");
+        const realmButton = makeElement("button", "realm-btn w-full flex items-center justify-between p-3 rounded-lg transition-colors bg-white/5 hover:bg-white/10 text-gray-200",
+            {"id": "button-"+realm, "data-realm": realm});
+        const realmName = makeElement("span", "font-semibold");
+        realmName.textContent = realm;
+        realmButton.append(realmName, makeChevron("w-4 h-4"));
+        realmButton.addEventListener("click", () => handlers.realm(realm));
+
+        //areas of this realm
+        const areasDiv = makeElement("div", "realm-areas ml-4 mt-2 space-y-1 hidden", {"id": "selection-"+realm});
+        for (const [area, locations] of Object.entries(areas)){
+            const areaDiv = document.createElement("div");
+            const areaButton = makeElement("button", "area-btn w-full flex items-center justify-between p-2 rounded transition-colors text-left bg-white/5 hover:bg-white/10 text-gray-300",
+                {"id": "button-"+realm+"-"+area, "data-realm": realm, "data-area": area});
+            const areaName = makeElement("span", "text-sm");
+            areaName.textContent = area;
+            areaButton.append(areaName);
+            if (locations.length > 0)
+                areaButton.append(makeChevron("w-3 h-3"));
+            areaButton.addEventListener("click", () => handlers.area(area, locations.length == 0));
+            areaDiv.append(areaButton);
+
+            //locations of this area
+            if (locations.length > 0){
+                const locationsDiv = makeElement("div", "area-locations ml-4 mt-1 space-y-1 hidden", {"id": "selection-"+realm+"-"+area});
+                for (const location of locations){
+                    const locationButton = makeElement("button", "location-btn w-full p-2 rounded transition-colors text-left text-xs bg-white/5 hover:bg-white/10 text-gray-400",
+                        {"id": "button-"+realm+"-"+area+"-"+location, "data-realm": realm, "data-area": area, "data-location": location});
+                    locationButton.textContent = location;
+                    locationButton.addEventListener("click", () => handlers.location(location));
+                    locationsDiv.append(locationButton);
+                }
+                areaDiv.append(locationsDiv);
+            }
+            areasDiv.append(areaDiv);
+        }
+        realmDiv.append(realmButton, areasDiv);
+        fragment.append(realmDiv);
+    }
+    container.replaceChildren(fragment);
+}
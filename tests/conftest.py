@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+
+# The tests run from the root of the project, without the config.py of a deployment (it holds the secrets)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import config
+except ImportError:
+    config = types.ModuleType("config")
+    config.URL = "http://127.0.0.1:54321"
+    config.APIkey = "test-key"
+    config.email = "test@example.com"
+    config.password = "test-password"
+    config.secret_key = "test-secret"
+    sys.modules["config"] = config
@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+class FakeResponse():
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeQuery():
+    """Subset of the PostgREST query builder used by SupabaseManager, on in-memory tables"""
+
+    def __init__(self, database, table):
+        self.database = database
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.row_range = None
+        self.row_limit = None
+        self.count = None
+        self.head = False
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+
+    def select(self, columns="*", count=None, head=False):
+        self.columns, self.count, self.head = columns, count, head
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def filter(self, column, operator, value):
+        assert (operator, value) == ("is", "null")
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def order(self, column, desc=False, nullsfirst=False):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def limit(self, size):
+        self.row_limit = size
+        return self
+
+    def update(self, payload, returning=None):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", ignore_duplicates=False, returning=None):
+        self.operation, self.payload = "upsert", payload
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    @staticmethod
+    def split_columns(columns):
+        """Split a select list at its top-level commas : "id, T(a, b)" -> ["id", "T(a, b)"]"""
+        parts, depth, current = [], 0, ""
+        for character in columns:
+            depth += {"(": 1, ")": -1}.get(character, 0)
+            if character == "," and depth == 0:
+                parts.append(current.strip())
+                current = ""
+            else:
+                current += character
+        return parts + [current.strip()] if current.strip() else parts
+
+    def project(self, row, columns=None):
+        columns = self.columns if columns is None else columns
+        if columns == "*":
+            return dict(row)
+        projected = {}
+        for column in self.split_columns(columns):
+            if column == "*":
+                projected.update(row)
+            elif "(" in column:
+                # Embedded resource : Pichunt_images(...) through the image_id foreign key
+                table, embedded_columns = column[:-1].split("(", 1)
+                images = {image["id"]: image for image in self.database.tables[table]}
+                projected[table] = self.project(images[row["image_id"]], embedded_columns) if row["image_id"] in images else None
+            else:
+                projected[column] = row.get(column)
+        return projected
+
+    def execute(self):
+        # A short delay widens the race windows between the threads
+        time.sleep(self.database.latency)
+        with self.database.lock:
+            self.database.calls.append((self.table, self.operation))
+            rows = self.database.tables.setdefault(self.table, [])
+            if self.operation == "select":
+                selected = [row for row in rows if all(test(row) for test in self.filters)]
+                for column, desc in reversed(self.orders):
+                    selected.sort(key=lambda row: (row.get(column) is None, row.get(column) or 0), reverse=desc)
+                count = len(selected)
+                if self.row_range:
+                    selected = selected[self.row_range[0]:self.row_range[1] + 1]
+                if self.row_limit is not None:
+                    selected = selected[:self.row_limit]
+                return FakeResponse([] if self.head else [self.project(row) for row in selected], count if self.count else None)
+            if self.operation == "update":
+                updated = []
+                for row in rows:
+                    if all(test(row) for test in self.filters):
+                        row.update(self.payload)
+                        updated.append(dict(row))
+                return FakeResponse(updated)
+            # upsert : INSERT ... ON CONFLICT (on_conflict) DO NOTHING / DO UPDATE
+            written = []
+            for payload in self.payload if isinstance(self.payload, list) else [self.payload]:
+                existing = [row for row in rows if row.get(self.on_conflict) == payload.get(self.on_conflict)]
+                if not existing:
+                    rows.append(dict(payload))
+                    written.append(dict(payload))
+                elif not self.ignore_duplicates:
+                    existing[0].update(payload)
+                    written.append(dict(existing[0]))
+            return FakeResponse(written)
+
+class FakeSupabase():
+    """In-memory stand-in of the Supabase client, shared by several managers like a database by several workers"""
+
+    def __init__(self, tables, latency=0.001):
+        self.tables = tables
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = []
+        self.functions = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, function, params=None):
+        return types.SimpleNamespace(execute=lambda: FakeResponse(self.functions[function](params or {})))
+
+class PostgrestStandIn(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in of PostgREST (/rest/v1) on the tables of a FakeSupabase, for the real supabase-py client :
+    the requests go through httpx, the connection pool and the JSON decoding like in production.
+    latency (seconds) is added to each response, bytes_sent counts the bodies sent per table.
+    """
+
+    # Backlog of the listening socket : many clients may connect at the same time
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, database, latency=0):
+        super().__init__(("127.0.0.1", 0), PostgrestHandler)
+        self.database = database
+        self.latency = latency
+        self.bytes_sent = {}
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def parse_value(value):
+    """PostgREST filter values are strings : numbers are compared as numbers"""
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        table = url.path.split("/rest/v1/")[1]
+        prefer = self.headers.get("Prefer", "")
+        query = FakeQuery(self.server.database, table)
+
+        if table.startswith("rpc/"):
+            data = self.server.database.functions[table[4:]](json.loads(body or "{}"))
+            return self.respond(table, data)
+
+        if self.command == "PATCH":
+            query.update(json.loads(body))
+        elif self.command == "POST":
+            query.upsert(json.loads(body), ignore_duplicates="resolution=ignore-duplicates" in prefer)
+
+        offset, limit = 0, None
+        for name, value in parse_qsl(url.query):
+            if name == "select":
+                query.select(value, count="count=" in prefer, head=self.command == "HEAD")
+            elif name == "order":
+                column, direction = value.split(".")[:2]
+                query.order(column, desc=direction == "desc")
+            elif name == "offset":
+                offset = int(value)
+            elif name == "limit":
+                limit = int(value)
+            elif name == "on_conflict":
+                query.on_conflict = value
+            elif value == "is.null":
+                query.filter(name, "is", "null")
+            else:
+                operator, operand = value.split(".", 1)
+                getattr(query, operator)(name, parse_value(operand))
+        if limit is not None:
+            query.range(offset, offset + limit - 1)
+
+        response = query.execute()
+        self.respond(table, response.data, response.count, minimal="return=minimal" in prefer)
+
+    def respond(self, table, data, count=None, minimal=False):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        payload = b"" if minimal else json.dumps(data).encode()
+        self.send_response(204 if minimal else 200)
+        self.send_header("Content-Type", "application/json")
+        if count is not None:
+            self.send_header("Content-Range", f"0-{max(len(data) - 1, 0)}/{count}")
+        if self.command == "HEAD":
+            payload = b""
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.bytes_sent[table] = self.server.bytes_sent.get(table, 0) + len(payload)
+
+    do_GET = do_HEAD = do_POST = do_PATCH = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+def make_images(count):
+    """Rows of Pichunt_images"""
+    return [{"id": i, "image": f"https://images.example/{i}.jpg", "variants": None, "placeholder": None,
+             "realm": "Isle of Dawn", "area": "Main Isle", "location": "Mural Cave" if i % 2 else None,
+             "difficulty": (i % 10) / 10, "rating_count": 0, "appeared": None}
+            for i in range(1, count + 1)]
+
+def make_manager(database):
+    """SupabaseManager connected to the fake database (no sign in)"""
+    from utils.database import SupabaseManager
+    manager = SupabaseManager()
+    manager.client = database
+    manager.token_expires_at = time.time() + 3600
+    return manager
@@ -0,0 +1,36 @@
+from fake_supabase import FakeSupabase, make_images, make_manager
+from models.game import GameLogic
+
+def test_misses_are_not_kept_without_cache():
+    database = FakeSupabase({"Pichunt_images": make_images(5)}, latency=0)
+    manager = make_manager(database)
+    manager.catalog.ttl = 0
+    for image_id in range(1, 6):
+        assert manager.get_answer(GameLogic(), image_id)['realm'] == "Isle of Dawn"
+        assert manager.get_image_url(GameLogic(), image_id) == f"https://images.example/{image_id}.jpg"
+    assert manager.catalog.answers == {} and manager.catalog.urls == {}
+
+def test_misses_are_kept_until_the_next_load():
+    images = make_images(5)
+    database = FakeSupabase({"Pichunt_images": images[:4]}, latency=0)
+    manager = make_manager(database)
+    manager.refresh_catalog(GameLogic())
+    # Image added since the load : queried once, then read from the index
+    database.tables["Pichunt_images"].append(images[4])
+    assert manager.get_answer(GameLogic(), 5) is not None
+    calls = len(database.calls)
+    assert manager.get_answer(GameLogic(), 5) is not None
+    assert len(database.calls) == calls
+    # The next load replaces the index
+    images[4]['realm'] = "Prairie"
+    manager.refresh_catalog(GameLogic(), force=True)
+    assert manager.get_answer(GameLogic(), 5)['realm'] == "Prairie"
+
+def test_miss_queried_before_a_load_is_not_kept():
+    database = FakeSupabase({"Pichunt_images": make_images(4)}, latency=0)
+    manager = make_manager(database)
+    manager.refresh_catalog(GameLogic())
+    version = manager.catalog.version
+    manager.catalog.load(make_images(4), GameLogic())
+    manager.catalog.remember('answers', version, 5, {'realm': "Prairie", 'area': "", 'location': ""})
+    assert 5 not in manager.catalog.answers
@@ -0,0 +1,57 @@
+import threading
+from datetime import date, timedelta
+from fake_supabase import FakeSupabase, make_images, make_manager
+
+def test_concurrent_first_hits_share_one_daily_image():
+    # 5 managers on the same database, like 5 workers : 50 first hits of the day at the same time
+    database = FakeSupabase({"Pichunt_images": make_images(20), "Daily_schedule": []})
+    managers = [make_manager(database) for _ in range(5)]
+    hits = 50
+    barrier = threading.Barrier(hits)
+    results = []
+    errors = []
+
+    def first_hit(manager):
+        try:
+            barrier.wait()
+            results.append(manager.get_supabase_daily())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=first_hit, args=(managers[i % len(managers)],)) for i in range(hits)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(results) == hits
+    assert len({image['id'] for image in results}) == 1
+    today = date.today().isoformat()
+    assert database.tables["Daily_schedule"] == [{'day': today, 'image_id': results[0]['id']}]
+    assert [row['id'] for row in database.tables["Pichunt_images"] if row['appeared'] == today] == [results[0]['id']]
+
+def test_next_calls_of_the_day_use_the_memo():
+    database = FakeSupabase({"Pichunt_images": make_images(5), "Daily_schedule": []})
+    manager = make_manager(database)
+    first = manager.get_supabase_daily()
+    calls = len(database.calls)
+    assert manager.get_supabase_daily() == first
+    assert len(database.calls) == calls
+
+def test_schedule_keeps_a_day_claimed_meanwhile():
+    database = FakeSupabase({"Pichunt_images": make_images(10), "Daily_schedule": []})
+    manager = make_manager(database)
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+
+    # The day is claimed between the read of the planned days and the upsert of the schedule
+    select_all = manager.select_all
+    def claim_then_select_all(table, columns):
+        database.tables["Daily_schedule"].append({'day': tomorrow, 'image_id': 3})
+        return select_all(table, columns)
+    manager.select_all = claim_then_select_all
+
+    schedule = manager.schedule_daily_images(days=3)
+    assert tomorrow in schedule
+    assert [row['image_id'] for row in database.tables["Daily_schedule"] if row['day'] == tomorrow] == [3]
+    assert len(database.tables["Daily_schedule"]) == 3
@@ -0,0 +1,50 @@
+import pytest
+from models.game import GameLogic
+from utils.database import ImageCatalogCache
+from fake_supabase import make_images
+
+@pytest.mark.parametrize("size", list(range(1, 130)) + [255, 256, 257, 1000, 4097])
+def test_shuffled_index_is_a_permutation(size):
+    game_logic = GameLogic()
+    for seed in (0, 1, 0xFFFFFFFF):
+        assert sorted(game_logic.shuffled_index(seed, position, size) for position in range(size)) == list(range(size))
+
+def test_deck_has_no_repeat_until_exhausted():
+    game_logic = GameLogic()
+    deck = {}
+    first = [game_logic.draw_from_deck(deck, 50) for _ in range(50)]
+    assert sorted(first) == list(range(50))
+    seed = deck['seed']
+    # Exhausted : a new order with a new seed, again without repeat
+    second = [game_logic.draw_from_deck(deck, 50) for _ in range(50)]
+    assert sorted(second) == list(range(50))
+    assert deck['seed'] != seed
+
+def test_deck_is_reshuffled_when_the_bucket_changes():
+    game_logic = GameLogic()
+    deck = {}
+    for _ in range(10):
+        game_logic.draw_from_deck(deck, 50, "aaaa")
+    # Same size, other images
+    game_logic.draw_from_deck(deck, 50, "bbbb")
+    assert (deck['cursor'], deck['fingerprint']) == (1, "bbbb")
+    # Other size
+    game_logic.draw_from_deck(deck, 51, "bbbb")
+    assert (deck['cursor'], deck['size']) == (1, 51)
+
+def test_catalog_deck_follows_the_replaced_images():
+    game_logic = GameLogic()
+    catalog = ImageCatalogCache()
+    images = make_images(30)
+    catalog.load(images, game_logic)
+    deck = {}
+    for _ in range(5):
+        catalog.pick("easy", game_logic, deck)
+    # One easy image replaced by another one : same bucket size, new fingerprint
+    catalog.load([image for image in images if image['id'] != 1] + [dict(images[0], id=31)], game_logic)
+    catalog.pick("easy", game_logic, deck)
+    assert deck['cursor'] == 1 and deck['fingerprint'] == catalog.fingerprints["easy"]
+    # Reloading the same images keeps the deck
+    catalog.load([image for image in images if image['id'] != 1] + [dict(images[0], id=31)], game_logic)
+    catalog.pick("easy", game_logic, deck)
+    assert deck['cursor'] == 2
@@ -0,0 +1,19 @@
+import os
+import pytest
+from fake_supabase import FakeSupabase, make_manager
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="os.fork is not available")
+def test_forked_child_gets_its_own_client_and_locks():
+    manager = make_manager(FakeSupabase({}))
+    manager.http_transport = object()
+    # A thread of the parent holds the lock at the time of the fork
+    manager.client_lock.acquire()
+    pid = os.fork()
+    if pid == 0:
+        ok = manager.client is None and manager.http_transport is None and manager.client_lock.acquire(blocking=False)
+        os._exit(0 if ok else 1)
+    manager.client_lock.release()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The parent keeps its connection
+    assert manager.client is not None
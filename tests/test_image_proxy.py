@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import app as application
+from fake_supabase import FakeSupabase, make_images, make_manager
+from utils.image_proxy import DiskImageCache
+
+class ImageOrigin(BaseHTTPRequestHandler):
+    """Local origin of the images : /<id> answers 1000 bytes of JPEG (WebP for /<id>.webp), and counts the downloads"""
+
+    def do_GET(self):
+        self.server.downloads += 1
+        body = b"x" * 1000
+        self.send_response(200)
+        self.send_header("Content-Type", "image/webp" if self.path.endswith(".webp") else "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def origin():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageOrigin)
+    server.downloads = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_workers_share_the_downloads(origin, tmp_path):
+    # Two caches on the same directory, like two workers
+    first, second = DiskImageCache(str(tmp_path)), DiskImageCache(str(tmp_path))
+    path = first.fetch(1, f"{origin.url}/1")
+    assert path.endswith("1.jpg")
+    assert second.fetch(1, f"{origin.url}/1") == path
+    assert origin.downloads == 1
+    assert second.stats()['hits'] == 1
+
+def test_size_bound_covers_the_files_of_every_worker(origin, tmp_path):
+    first, second = DiskImageCache(str(tmp_path), max_bytes=2500), DiskImageCache(str(tmp_path), max_bytes=2500)
+    first.fetch(1, f"{origin.url}/1")
+    second.fetch(2, f"{origin.url}/2")
+    # The image 1 is served after the image 2 : the image 2 is the least recently served
+    time.sleep(0.01)
+    first.fetch(1, f"{origin.url}/1")
+    second.fetch(3, f"{origin.url}/3")
+    assert sorted(os.listdir(tmp_path)) == ["1.jpg", "3.jpg"]
+    assert first.stats()['bytes'] == 2000
+
+def test_image_evicted_by_another_worker_is_downloaded_again(origin, tmp_path):
+    first, second = DiskImageCache(str(tmp_path)), DiskImageCache(str(tmp_path))
+    path = first.fetch(1, f"{origin.url}/1")
+    os.remove(path)
+    assert first.get(1) is None
+    assert second.fetch(1, f"{origin.url}/1") == path
+    assert origin.downloads == 2
+
+def test_lookup_does_not_list_the_directory(origin, tmp_path, monkeypatch):
+    first, second = DiskImageCache(str(tmp_path)), DiskImageCache(str(tmp_path))
+    first.fetch(1, f"{origin.url}/1")
+    first.fetch("1-640-webp", f"{origin.url}/1-640.webp")
+    monkeypatch.setattr(os, "scandir", None)
+    # Known names : the image id, or id-width-format for a variant, and the extension of the content type
+    assert second.get(1).endswith("1.jpg")
+    assert second.get("1-640-webp").endswith("1-640-webp.webp")
+    assert second.get(2) is None
+
+@pytest.fixture
+def client(origin, tmp_path, monkeypatch):
+    images = make_images(3)
+    for image in images:
+        image['image'] = f"{origin.url}/{image['id']}"
+        image['variants'] = {"webp": {"320": f"{origin.url}/{image['id']}-320.webp", "640": f"{origin.url}/{image['id']}-640.webp"}}
+    monkeypatch.setattr(application, "db_manager", make_manager(FakeSupabase({"Pichunt_images": images}, latency=0)))
+    monkeypatch.setattr(application, "image_cache", DiskImageCache(str(tmp_path)))
+    return application.app.test_client()
+
+def test_variants_are_served_through_the_proxy(client, origin):
+    image = client.get("/api/new-image?difficulty=easy").get_json()
+    assert image['url'] == f"/img/{image['id']}"
+    assert image['srcset'] == f"/img/{image['id']}/320.webp 320w, /img/{image['id']}/640.webp 640w"
+    for _ in range(2):
+        response = client.get(f"/img/{image['id']}/640.webp")
+        assert response.status_code == 200 and response.mimetype == "image/webp"
+    assert origin.downloads == 1
+    assert client.get(f"/img/{image['id']}/1280.webp").status_code == 404
@@ -0,0 +1,60 @@
+from models.game import GameLogic
+from models.locations import locations
+from models.location_index import location_index
+
+game_logic = GameLogic()
+PERFECT_SCORE = sum(game_logic.score_system.values())
+
+def test_every_valid_answer_is_accepted_and_scores_perfectly():
+    assert location_index.valid
+    for realm, area, location in location_index.valid:
+        assert game_logic.validate_selection(realm, area, location) == {'valid': True}, (realm, area, location)
+        answer = {'realm': realm, 'area': area, 'location': location}
+        assert game_logic.calculate_score(answer, realm, area, location) == PERFECT_SCORE, (realm, area, location)
+
+def test_leaf_areas_are_answered_without_location():
+    assert location_index.leaf_areas
+    for realm, area in location_index.leaf_areas:
+        assert not locations[realm][area]
+        assert game_logic.validate_selection(realm, area, "") == {'valid': True}
+        assert game_logic.calculate_score({'realm': realm, 'area': area, 'location': ''}, realm, area, "") == PERFECT_SCORE
+
+def test_areas_with_locations_need_a_location():
+    for realm, areas in locations.items():
+        for area, area_locations in areas.items():
+            if area_locations:
+                assert (realm, area) not in location_index.leaf_areas
+                assert game_logic.validate_selection(realm, area, "") == {'valid': False, 'error': 'Please select a valid location.'}
+                # The right area without the location gets the realm and area points only
+                location = sorted(area_locations)[0]
+                answer = {'realm': realm, 'area': area, 'location': location}
+                assert game_logic.calculate_score(answer, realm, area, "") == game_logic.score_system['realm'] + game_logic.score_system['area']
+
+def test_the_index_covers_the_locations_tree():
+    expected = {(realm, area, location) for realm, areas in locations.items() for area, area_locations in areas.items()
+                for location in (area_locations or [""])}
+    assert location_index.valid == expected
+
+def test_invalid_selections_are_explained():
+    realm, area, location = sorted(path for path in location_index.valid if path[2])[0]
+    assert game_logic.validate_selection("", "", "")['error'] == 'Please select a valid realm.'
+    assert game_logic.validate_selection("Nowhere", area, location)['error'] == 'Invalid realm.'
+    assert game_logic.validate_selection(realm, "", "")['error'] == 'Please select a valid area.'
+    assert game_logic.validate_selection(realm, "Nowhere", location)['error'] == 'Invalid area for this realm.'
+    assert game_logic.validate_selection(realm, area, "Nowhere")['error'] == 'Invalid location for this area.'
+
+def test_scores_match_the_comparison_of_the_names():
+    # Every valid answer against every valid selection, and a few unknown names : the index gives the same
+    # points as comparing the realm, area and location names level by level
+    selections = sorted(location_index.valid) + [("Nowhere", "", ""), (sorted(location_index.valid)[0][0], "Nowhere", "")]
+    for realm, area, location in location_index.valid:
+        answer = {'realm': realm, 'area': area, 'location': location}
+        for selected in selections:
+            expected = 0
+            if selected[0] == realm:
+                expected += game_logic.score_system['realm']
+                if selected[1] == area:
+                    expected += game_logic.score_system['area']
+                    if selected[2] == location:
+                        expected += game_logic.score_system['location']
+            assert game_logic.calculate_score(answer, *selected) == expected, (answer, selected)
@@ -0,0 +1,50 @@
+import threading
+import pytest
+from flask import Flask
+from utils.page_cache import PageCache
+
+@pytest.fixture
+def app(tmp_path):
+    (tmp_path / "page.html").write_text("<p>{{ score }} {{ mode }}</p>")
+    app = Flask(__name__, template_folder=str(tmp_path))
+    app.page_cache = PageCache(app, version="v1")
+
+    @app.route("/<mode>/<int:score>")
+    def page(mode, score):
+        return app.page_cache.render("page.html", score=score, mode=mode)
+
+    return app
+
+def test_page_holds_the_score_of_the_request(app):
+    client = app.test_client()
+    assert client.get("/hunt/100").text == "<p>100 hunt</p>"
+    assert client.get("/hunt/700").text == "<p>700 hunt</p>"
+    assert app.page_cache.stats() == {'hits': 1, 'misses': 1, 'pages': 1}
+
+def test_copy_with_an_older_score_is_not_revalidated(app):
+    client = app.test_client()
+    first = client.get("/hunt/100")
+    assert "Last-Modified" not in first.headers
+    # Same score : the browser's copy is up to date
+    assert client.get("/hunt/100", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    # The score changed : the page is sent again, whatever the date of the browser's copy
+    response = client.get("/hunt/400", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200 and response.text == "<p>400 hunt</p>"
+
+def test_counters_are_exact_under_concurrency(app):
+    threads, requests = 8, 200
+    barrier = threading.Barrier(threads)
+
+    def serve():
+        client = app.test_client()
+        barrier.wait()
+        for score in range(requests):
+            client.get(f"/hunt/{score}")
+
+    workers = [threading.Thread(target=serve) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stats = app.page_cache.stats()
+    assert stats['hits'] + stats['misses'] == threads * requests
@@ -0,0 +1,37 @@
+import pytest
+import app as application
+from fake_supabase import FakeSupabase, make_manager
+
+PREVIEWS = [{"id": 1, "URL": "https://images.example/realm.jpg", "variants": None, "Type": "Realm", "Realm": "Isle of Dawn", "Area": None, "Location": None},
+            {"id": 2, "URL": "https://images.example/area.jpg", "variants": None, "Type": "Area", "Realm": "Isle of Dawn", "Area": "Main Isle", "Location": None}]
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeSupabase({"Preview_images": [dict(preview) for preview in PREVIEWS]}, latency=0)
+    manager = make_manager(database)
+    # PREVIEW_CACHE_TTL = 0 : each preview is queried, the manifest still needs the whole table
+    manager.previews.ttl = 0
+    monkeypatch.setattr(application, "db_manager", manager)
+    return database
+
+def preview_queries(database):
+    return sum(1 for table, operation in database.calls if table == "Preview_images")
+
+def test_manifest_is_not_reloaded_for_each_request(database):
+    client = application.app.test_client()
+    client.get("/api/preview-manifest")
+    queries = preview_queries(database)
+    for _ in range(5):
+        manifest = client.get("/api/preview-manifest").get_json()
+    assert manifest["area"] == {"Isle of Dawn > Main Isle": "https://images.example/area.jpg"}
+    assert preview_queries(database) == queries
+
+def test_manifest_is_reloaded_after_the_minimum_ttl(database):
+    client = application.app.test_client()
+    client.get("/api/preview-manifest")
+    queries = preview_queries(database)
+    database.tables["Preview_images"][0]["URL"] = "https://images.example/new-realm.jpg"
+    application.db_manager.previews.loaded_at -= 61
+    manifest = client.get("/api/preview-manifest").get_json()
+    assert manifest["realm"] == {"Isle of Dawn": "https://images.example/new-realm.jpg"}
+    assert preview_queries(database) > queries
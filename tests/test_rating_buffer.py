@@ -0,0 +1,105 @@
+import time
+import pytest
+from utils import rating_buffer
+from utils.rating_buffer import RatingBuffer
+
+class FakeManager():
+    """Records the batches of add_ratings, fails while failing is True"""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+
+    def add_ratings(self, deltas):
+        if self.failing:
+            raise ConnectionError("database unavailable")
+        self.batches.append(sorted(deltas, key=lambda delta: delta['id']))
+        return len(deltas)
+
+@pytest.fixture
+def registered(monkeypatch):
+    """The shutdown hooks registered with atexit, not run at the end of the tests"""
+    hooks = []
+    monkeypatch.setattr(rating_buffer.atexit, "register", hooks.append)
+    return hooks
+
+def make_buffer(registered, **options):
+    manager = FakeManager()
+    # The flusher thread only wakes up when the tests flush or stop the buffer
+    buffer = RatingBuffer(manager, flush_interval=3600, flush_size=10**6, **options)
+    return buffer, manager
+
+def test_votes_are_aggregated_per_picture(registered):
+    buffer, manager = make_buffer(registered)
+    for picture_id, rating in [(1, 5), (2, 1), (1, 3), (1, 4)]:
+        assert buffer.add(picture_id, rating)
+    assert buffer.flush() == 4
+    assert manager.batches == [[{'id': 1, 'sum': 12, 'count': 3}, {'id': 2, 'sum': 1, 'count': 1}]]
+    assert buffer.stats() == {'queued': 4, 'flushed': 4, 'dropped': 0, 'pending': 0}
+    # Nothing left to flush
+    assert buffer.flush() == 0
+    assert len(manager.batches) == 1
+
+def test_new_pictures_are_dropped_above_the_limit(registered):
+    buffer, manager = make_buffer(registered, max_pictures=2)
+    assert buffer.add(1, 3)
+    assert buffer.add(2, 3)
+    assert not buffer.add(3, 3)
+    # A picture already waiting still takes votes
+    assert buffer.add(1, 5)
+    assert buffer.stats() == {'queued': 3, 'flushed': 0, 'dropped': 1, 'pending': 3}
+    buffer.flush()
+    assert [delta['id'] for delta in manager.batches[0]] == [1, 2]
+
+def test_votes_are_put_back_when_a_flush_fails(registered):
+    buffer, manager = make_buffer(registered)
+    buffer.add(1, 2)
+    buffer.add(2, 4)
+    manager.failing = True
+    assert buffer.flush() == 0
+    assert buffer.stats()['pending'] == 2
+    # Votes queued after the failure are merged with the ones put back
+    buffer.add(1, 5)
+    manager.failing = False
+    assert buffer.flush() == 3
+    assert manager.batches == [[{'id': 1, 'sum': 7, 'count': 2}, {'id': 2, 'sum': 4, 'count': 1}]]
+
+def test_put_back_respects_the_limit(registered):
+    buffer, manager = make_buffer(registered, max_pictures=2)
+    buffer.add(1, 2)
+    buffer.add(2, 4)
+    manager.failing = True
+    # The flush takes the votes out of the buffer, new pictures fill it meanwhile
+    original_add_ratings = manager.add_ratings
+    def fill_then_fail(deltas):
+        buffer.add(3, 1)
+        buffer.add(4, 1)
+        return original_add_ratings(deltas)
+    manager.add_ratings = fill_then_fail
+    buffer.flush()
+    assert buffer.stats()['dropped'] == 2
+    assert sorted(buffer.pending) == [3, 4]
+
+def test_shutdown_flushes_the_remaining_votes(registered):
+    buffer, manager = make_buffer(registered)
+    assert registered == [buffer.stop]
+    buffer.add(1, 4)
+    buffer.add(1, 2)
+    assert buffer.thread.is_alive()
+    # atexit runs the registered hook
+    registered[0]()
+    assert not buffer.thread.is_alive()
+    assert manager.batches == [[{'id': 1, 'sum': 6, 'count': 2}]]
+    assert buffer.stats()['pending'] == 0
+
+def test_flush_size_wakes_up_the_flusher(registered):
+    manager = FakeManager()
+    buffer = RatingBuffer(manager, flush_interval=3600, flush_size=3)
+    for rating in (1, 2, 3):
+        buffer.add(7, rating)
+    # The flusher thread wakes up without waiting for the interval
+    deadline = time.monotonic() + 2
+    while not manager.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.batches == [[{'id': 7, 'sum': 6, 'count': 3}]]
+    buffer.stop()
@@ -0,0 +1,85 @@
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+import config
+import app as application
+from fake_supabase import FakeSupabase, make_images, make_manager
+
+ANSWER = {'realm': "Isle of Dawn", 'area': "Main Isle", 'location': "Mural Cave"}
+
+@pytest.fixture
+def client(monkeypatch):
+    database = FakeSupabase({"Pichunt_images": make_images(30)}, latency=0)
+    monkeypatch.setattr(application, "db_manager", make_manager(database))
+    monkeypatch.setattr(application, "rating_buffer", None)
+    return application.app.test_client()
+
+def next_rounds(client, difficulty="easy", n=3, after=""):
+    response = client.get(f"/api/next-images?difficulty={difficulty}&n={n}&after={after}")
+    assert response.status_code == 200
+    return response.get_json()
+
+def play(client, hunt_round):
+    return client.post("/api/check-answer", json=dict(ANSWER, round=hunt_round['round']))
+
+def test_rounds_are_issued_without_answers(client):
+    rounds = next_rounds(client, n=3)
+    assert len(rounds) == 3 and len({r['id'] for r in rounds}) == 3
+    assert all(set(r) == {'round', 'id', 'url', 'srcset', 'placeholder', 'difficulty', 'rating_count'} for r in rounds)
+
+def test_played_round_becomes_the_current_image(client):
+    rounds = next_rounds(client)
+    response = play(client, rounds[1])
+    assert response.status_code == 200
+    assert response.get_json()['total_score'] == response.get_json()['points']
+    with client.session_transaction() as session:
+        assert session['current_image_id'] == rounds[1]['id']
+        # Only a round number is kept in the session, not the tokens
+        assert session['rounds'] == {'easy': 2}
+
+def test_round_cannot_be_replayed(client):
+    rounds = next_rounds(client)
+    assert play(client, rounds[1]).status_code == 200
+    for hunt_round in rounds[:2]:
+        response = play(client, hunt_round)
+        assert response.status_code == 400 and response.get_json()['round_expired']
+    assert play(client, rounds[2]).status_code == 200
+
+def test_difficulties_are_independent(client):
+    easy, medium = next_rounds(client, "easy"), next_rounds(client, "medium")
+    assert play(client, easy[2]).status_code == 200
+    assert play(client, medium[0]).status_code == 200
+    assert play(client, easy[0]).status_code == 400
+    # An easy round doesn't continue the medium deck : the batch follows the last medium round played
+    assert next_rounds(client, "medium", n=1, after=easy[2]['round'])[0]['id'] == medium[1]['id']
+    with client.session_transaction() as session:
+        assert session['rounds'] == {'easy': 3, 'medium': 1}
+
+def test_batches_follow_the_last_queued_round(client):
+    first = next_rounds(client, n=3)
+    second = next_rounds(client, n=3, after=first[-1]['round'])
+    # 12 easy images : no repetition across the batches
+    assert len({r['id'] for r in first + second}) == 6
+    for hunt_round in first + second:
+        assert play(client, hunt_round).status_code == 200
+    # Without after, the next batch follows the last round played
+    third = next_rounds(client, n=3)
+    assert len({r['id'] for r in first + second + third}) == 9
+
+def test_refill_does_not_write_the_session(client):
+    rounds = next_rounds(client)
+    assert play(client, rounds[0]).status_code == 200
+    # A refill running while an answer is sent must not send back an older score
+    response = client.get(f"/api/next-images?difficulty=easy&after={rounds[-1]['round']}")
+    assert "Set-Cookie" not in response.headers
+
+@pytest.mark.parametrize("token", ["forged", "eyJpZCI6MX0.forged.signature",
+                                   URLSafeTimedSerializer("other-secret", salt='hunt-round').dumps({'id': 1, 'difficulty': "easy", 'number': 0, 'deck': {}})])
+def test_invalid_round_is_expired(client, token):
+    response = client.post("/api/check-answer", json=dict(ANSWER, round=token))
+    assert response.status_code == 400 and response.get_json()['round_expired']
+
+def test_old_round_is_expired(client, monkeypatch):
+    rounds = next_rounds(client)
+    monkeypatch.setattr(config, "ROUND_MAX_AGE", -1, raising=False)
+    response = play(client, rounds[0])
+    assert response.status_code == 400 and response.get_json()['round_expired']
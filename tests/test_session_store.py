@@ -0,0 +1,137 @@
+import time
+import pytest
+from flask import Flask, session
+from utils.session_store import MemoryStore, SQLiteStore, RedisStore, ServerSideSessionInterface, create_session_interface
+
+class FakeRedis():
+    """Dict-backed stand-in of redis.Redis : the get, setex and delete used by RedisStore, with the expiry"""
+
+    def __init__(self):
+        # {key: (expiry timestamp, bytes)}
+        self.data = {}
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None or entry[0] <= time.time():
+            self.data.pop(key, None)
+            return None
+        return entry[1]
+
+    def setex(self, key, ttl, value):
+        self.data[key] = (time.time() + ttl, value.encode() if isinstance(value, str) else value)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() moved forward by the tests"""
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "sessions.sqlite3"))
+    return RedisStore(FakeRedis())
+
+def test_store_get_set_delete(store):
+    assert store.get("sid") is None
+    store.set("sid", '{"score": 1}', 60)
+    assert store.get("sid") == '{"score": 1}'
+    store.set("sid", '{"score": 2}', 60)
+    assert store.get("sid") == '{"score": 2}'
+    store.delete("sid")
+    assert store.get("sid") is None
+
+def test_store_expiry(store, clock):
+    store.set("sid", "{}", 60)
+    clock[0] += 59
+    assert store.get("sid") == "{}"
+    clock[0] += 2
+    assert store.get("sid") is None
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemoryStore(max_entries=2)
+    store.set("first", "1", 60)
+    store.set("second", "2", 60)
+    store.get("first")
+    store.set("third", "3", 60)
+    assert (store.get("first"), store.get("second"), store.get("third")) == ("1", None, "3")
+
+@pytest.fixture
+def app(store):
+    app = Flask(__name__)
+    app.secret_key = "test-secret"
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route("/add/<int:points>")
+    def add(points):
+        session['score'] = session.get('score', 0) + points
+        return str(session['score'])
+
+    @app.route("/score")
+    def score():
+        return str(session.get('score', 0))
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return ""
+
+    return app
+
+def session_cookie(client):
+    return client.get_cookie("session")
+
+def test_session_is_kept_in_the_store(app, store):
+    client = app.test_client()
+    assert client.get("/add/3").text == "3"
+    assert client.get("/add/4").text == "7"
+    sid = session_cookie(client).value
+    # The cookie only holds the random id (a signed cookie session would be payload.timestamp.signature)
+    assert len(sid) == 32 and "." not in sid
+    assert ServerSideSessionInterface.serializer.loads(store.get(sid)) == {"score": 7}
+    # Another browser has its own session
+    other = app.test_client()
+    assert other.get("/score").text == "0"
+    assert session_cookie(other) is None or session_cookie(other).value != sid
+
+def test_cookie_is_only_sent_with_a_new_session(app):
+    client = app.test_client()
+    assert "Set-Cookie" in client.get("/add/1").headers
+    assert "Set-Cookie" not in client.get("/add/1").headers
+    # A read-only request with no session doesn't create one
+    assert "Set-Cookie" not in app.test_client().get("/score").headers
+
+def test_cleared_session_is_deleted(app, store):
+    client = app.test_client()
+    client.get("/add/5")
+    sid = session_cookie(client).value
+    response = client.get("/clear")
+    assert store.get(sid) is None
+    assert "Expires=Thu, 01 Jan 1970" in response.headers["Set-Cookie"]
+    assert client.get("/score").text == "0"
+
+def test_expired_session_starts_a_new_one(app, clock):
+    app.permanent_session_lifetime = 60
+    client = app.test_client()
+    client.get("/add/5")
+    sid = session_cookie(client).value
+    clock[0] += 61
+    assert client.get("/score").text == "0"
+    assert client.get("/add/1").text == "1"
+    assert session_cookie(client).value != sid
+
+def test_unknown_session_id_is_replaced(app):
+    client = app.test_client()
+    client.set_cookie("session", "forged")
+    assert client.get("/add/2").text == "2"
+    assert session_cookie(client).value != "forged"
+
+def test_redis_backend_requires_a_url():
+    with pytest.raises(ValueError, match="SESSION_REDIS_URL"):
+        create_session_interface(Flask(__name__), "redis", url=None)
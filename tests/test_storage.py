@@ -0,0 +1,52 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+import config
+from utils.database import SupabaseManager
+
+class SupabaseStandIn(BaseHTTPRequestHandler):
+    """Local stand-in of the Supabase API : records the requests and answers with an empty JSON document"""
+
+    def handle_request(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.command, self.path.split("?")[0], body))
+        payload = json.dumps({"Key": "variants/uploaded"} if self.path.startswith("/storage/") else []).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_PUT = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def supabase_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SupabaseStandIn)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(config, "URL", url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_queries_still_reach_postgrest_after_an_upload(supabase_url):
+    manager = SupabaseManager()
+    manager.authorize(SimpleNamespace(access_token="token", refresh_token="refresh", expires_at=time.time() + 3600))
+
+    # Same order as generate_variants : the rows are read, then the variants are uploaded and stored
+    manager.select_all("Pichunt_images", "id, image, variants")
+    url = manager.upload_variant("Pichunt_images/1/320.webp", b"webp", "image/webp")
+    manager.set_variants("Pichunt_images", 1, {"webp": {"320": url}})
+
+    paths = [(method, path) for method, path, _ in supabase_url.requests]
+    assert paths == [("GET", "/rest/v1/Pichunt_images"),
+                     ("POST", "/storage/v1/object/variants/Pichunt_images/1/320.webp"),
+                     ("PATCH", "/rest/v1/Pichunt_images")]
+    assert url.startswith(config.URL + "/storage/v1/object/public/variants/Pichunt_images/1/320.webp")
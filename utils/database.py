@@ -1,32 +1,402 @@
 import supabase
 from supabase import create_client, Client, ClientOptions
+import httpx
+import hashlib
+import json
+import os
 import random
+import threading
+import time
+import weakref
 from datetime import date, datetime, timedelta
+from utils.image_variants import srcset
 import config
 
+class ImageCatalogCache():
+    """In-process copy of the Pichunt_images catalog, grouped by difficulty bucket"""
+
+    # Buckets matching GameLogic.get_difficulty_range
+    DIFFICULTIES = ["easy", "medium", "hard"]
+
+    def __init__(self, ttl=300):
+        """
+        Args:
+            ttl (int): number of seconds before the catalog is considered stale and reloaded
+        """
+        self.ttl = ttl
+        self.buckets = {}
+        # Hash of the ids of each bucket : the players' decks are reshuffled when it changes
+        self.fingerprints = {}
+        # Answer index : {image id: {'realm', 'area', 'location'}}
+        self.answers = {}
+        # Origin URLs of the images and of their variants : {image id: {'image': url, 'variants': {format: {width: url}}}}
+        self.urls = {}
+        # Incremented by each load : an answer queried before a load must not be added to the new index
+        self.version = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        """
+        Returns:
+            bool: True if the catalog was never loaded or if its TTL has expired
+        """
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl
+
+    def load(self, rows, game_logic):
+        """
+        Replace the cached catalog by the given rows, grouped by difficulty bucket.
+
+        Args:
+            rows (list): rows of Pichunt_images
+            game_logic (GameLogic): used to get the difficulty range of each bucket
+        """
+        buckets = {}
+        # Buckets are ordered by id : a position in a player's deck always gives the same image
+        rows = sorted(rows, key=lambda row: row['id'])
+        for difficulty in self.DIFFICULTIES:
+            difficulty_range = game_logic.get_difficulty_range(difficulty)
+            buckets[difficulty] = [row for row in rows
+                                   if row['difficulty'] is not None and difficulty_range[0] <= row['difficulty'] < difficulty_range[1]]
+        fingerprints = {difficulty: hashlib.sha256(",".join(str(row['id']) for row in bucket).encode()).hexdigest()[:8]
+                        for difficulty, bucket in buckets.items()}
+        answers = {row['id']: {'realm': row['realm'], 'area': row['area'], 'location': row['location'] or ''} for row in rows}
+        urls = {row['id']: {'image': row['image'], 'variants': row.get('variants') or {}} for row in rows}
+        # Swap the whole dicts at once so readers never see a half-built catalog, the version first (see remember)
+        self.version += 1
+        # The fingerprints after the buckets, pick reads them before : a deck never gets a new fingerprint with an old bucket
+        self.buckets = buckets
+        self.fingerprints = fingerprints
+        self.answers = answers
+        self.urls = urls
+        self.loaded_at = time.monotonic()
+
+    def remember(self, index, version, image_id, value):
+        """
+        Add a value queried for an image missing from the catalog to one of its indexes (answers or urls).
+        Nothing is added when the cache is disabled (the index would only grow) or when the catalog has been
+        reloaded since the query (the value may be older than the new catalog).
+        """
+        # The dict is taken before the version check : if the check passes, it is not the one of a newer load
+        entries = getattr(self, index)
+        if self.ttl > 0 and self.version == version:
+            entries[image_id] = value
+
+    def pick(self, difficulty, game_logic=None, deck=None):
+        """
+        Pick a row in the bucket of the given difficulty, without any database round trip :
+        the next one of the player's deck if given (see GameLogic.draw_from_deck), else a random one.
+
+        Returns:
+            dict|None: the row, None if the bucket is empty
+        """
+        fingerprint = self.fingerprints.get(difficulty.lower())
+        bucket = self.buckets.get(difficulty.lower())
+        if not bucket:
+            return None
+        if deck is not None:
+            return bucket[game_logic.draw_from_deck(deck, len(bucket), fingerprint)]
+        return random.choice(bucket)
+
+class PreviewCache():
+    """In-process copy of the Preview_images table, keyed by (type, realm, area, location)"""
+
+    def __init__(self, ttl=3600):
+        """
+        Args:
+            ttl (int): number of seconds before the previews are considered stale and reloaded
+        """
+        self.ttl = ttl
+        # {(type, realm, area, location): preview}, area and location are "" when they don't apply
+        self.previews = {}
+        # Hash of the previews, changes when a preview is added, removed or modified
+        self.version = ""
+        # Every preview URL in one document for the frontend (see load)
+        self.manifest = {"version": "", "realm": {}, "area": {}, "location": {}, "srcset": {}}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(type, realm, area="", location=""):
+        """
+        Returns:
+            tuple: the key of a preview, the area and location are ignored when the type does not use them
+        """
+        type = type.capitalize()
+        return (type, realm, area if type in ["Area", "Location"] else "", location if type == "Location" else "")
+
+    def is_stale(self, ttl=None):
+        """
+        Args:
+            ttl (int|None): TTL to check instead of the one of the cache
+
+        Returns:
+            bool: True if the previews were never loaded or if their TTL has expired
+        """
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= (self.ttl if ttl is None else ttl)
+
+    def load(self, previews):
+        """
+        Replace the cached previews.
+
+        Args:
+            previews (list): previews formatted by SupabaseManager.format_preview
+        """
+        cache = {self.key(preview.get("type") or "", preview.get("realm") or "", preview.get("area") or "", preview.get("location") or ""): preview
+                 for preview in sorted(previews, key=lambda preview: preview["id"])}
+        version = hashlib.sha256(json.dumps(sorted(cache.values(), key=lambda preview: preview["id"]), sort_keys=True).encode()).hexdigest()[:16]
+
+        # Manifest : the URLs by type, keyed by "realm", "realm > area" or "realm > area > location",
+        # and the srcset of the previews that have variants, with the same keys
+        manifest = {"version": version, "realm": {}, "area": {}, "location": {}, "srcset": {}}
+        for (type, realm, area, location), preview in cache.items():
+            if type.lower() in ["realm", "area", "location"]:
+                key = " > ".join(name for name in (realm, area, location) if name)
+                manifest[type.lower()][key] = preview["url"]
+                if preview.get("srcset"):
+                    manifest["srcset"].setdefault(type.lower(), {})[key] = preview["srcset"]
+
+        self.version = version
+        self.manifest = manifest
+        self.previews = cache
+        self.loaded_at = time.monotonic()
+
+    def get(self, type, realm, area="", location=""):
+        """
+        Returns:
+            dict|None: the preview, None if there is none for this realm, area or location
+        """
+        return self.previews.get(self.key(type, realm, area, location))
+
 class SupabaseManager():
+    # Columns fetched by each query : wide columns never travel unless a query needs them
+    IMAGE_COLUMNS = "id, image, variants, placeholder, realm, area, location, difficulty, rating_count"
+    DAILY_COLUMNS = IMAGE_COLUMNS + ", appeared"
+    PREVIEW_COLUMNS = "id, URL, variants, Type, Realm, Area, Location"
+    ANSWER_COLUMNS = "id, realm, area, location"
+    # Rows per page of the full-table reads (see select_all), at most the max-rows setting of PostgREST (1000 by default)
+    PAGE_SIZE = 1000
+
     def __init__(self):
-        """Initialize Supabase client connection"""
+        """
+        Initialize the manager without any network call : the Supabase client is connected on first use
+        (see the supabase property) or by the background health check (see start_health_check).
+        """
+        if not getattr(config, 'URL', None) or not getattr(config, 'APIkey', None):
+            raise ValueError("Supabase URL and APIkey must be defined in config.py")
+
+        # Catalog of the images, refreshed every CATALOG_CACHE_TTL seconds (0 disables the cache)
+        self.catalog = ImageCatalogCache(ttl=getattr(config, 'CATALOG_CACHE_TTL', 300))
+        # Preview images of the realms, areas and locations, refreshed every PREVIEW_CACHE_TTL seconds (0 disables the cache)
+        self.previews = PreviewCache(ttl=getattr(config, 'PREVIEW_CACHE_TTL', 3600))
+        # Daily image already served by this process, keyed by date : {'YYYY-MM-DD': image}
+        self.daily_memo = {}
+        self.daily_lock = threading.Lock()
+
+        # Authorized Supabase client, created by connect() and replaced by refresh_token()
+        self.client = None
+        self.client_lock = threading.Lock()
+        # Connection pool shared by all the query clients of this worker, created by create_http_client()
+        self.http_transport = None
+        # Client used only for the authentication (sign in, token refresh)
+        self.auth_client = None
+        # Storage client of the uploads and the token it was authorized with, created by get_storage()
+        self.storage_client = None
+        self.storage_token = None
+        self.access_token = None
+        self.refresh_token_value = None
+        self.token_expires_at = None
+        # The token is refreshed TOKEN_REFRESH_MARGIN seconds before it expires
+        self.token_refresh_margin = getattr(config, 'TOKEN_REFRESH_MARGIN', 60)
+        # Duration of each step of the connection, in milliseconds
+        self.startup_timings = {}
+        # Token refresh metrics (durations in milliseconds)
+        self.token_metrics = {'refresh_count': 0, 'refresh_failures': 0, 'last_refresh_ms': None, 'total_refresh_ms': 0.0}
+        self.health_check_started = False
+
+        # gunicorn --preload forks the workers after the import : each worker needs its own locks and connections
+        manager = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: manager() and manager().after_fork())
+
+    @property
+    def supabase(self) -> Client:
+        """Authorized Supabase client, connected on first use and refreshed before its token expires"""
+        if self.client is None or self.token_expiring():
+            # Only one thread connects or refreshes the token. While the current token is still valid,
+            # the other threads don't wait and keep using the current client.
+            if self.client_lock.acquire(blocking=self.client is None or self.token_expiring(margin=0)):
+                try :
+                    # Another thread may have connected or refreshed while we were waiting for the lock
+                    if self.client is None:
+                        self.connect()
+                    elif self.token_expiring():
+                        self.refresh_token()
+                finally :
+                    self.client_lock.release()
+        return self.client
+
+    def token_expiring(self, margin=None):
+        """
+        Args:
+            margin (int): number of seconds before the expiry, TOKEN_REFRESH_MARGIN by default
+
+        Returns:
+            bool: True if the token expires in less than margin seconds
+        """
+        if self.token_expires_at is None:
+            return False
+        margin = self.token_refresh_margin if margin is None else margin
+        return time.time() >= self.token_expires_at - margin
+
+    def create_http_client(self):
+        """
+        Create an httpx client for the queries. All the clients share the same transport, so the connections
+        are kept alive and reused across threads and token refreshes. Settings in config.py :
+        HTTP_POOL_SIZE, HTTP_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP2.
+
+        Returns:
+            httpx.Client: the new client
+        """
+        if self.http_transport is None:
+            self.http_transport = httpx.HTTPTransport(
+                http2=getattr(config, 'HTTP2', False),
+                limits=httpx.Limits(
+                    max_connections=getattr(config, 'HTTP_POOL_SIZE', 20),
+                    max_keepalive_connections=getattr(config, 'HTTP_KEEPALIVE', 10),
+                    keepalive_expiry=getattr(config, 'HTTP_KEEPALIVE_EXPIRY', 30)
+                )
+            )
+        # Each query client gets its own httpx client (PostgREST sets its headers on it) on top of the shared transport
+        return httpx.Client(
+            transport=self.http_transport,
+            timeout=httpx.Timeout(getattr(config, 'HTTP_READ_TIMEOUT', 10), connect=getattr(config, 'HTTP_CONNECT_TIMEOUT', 5))
+        )
+
+    def authorize(self, session):
+        """
+        Create the client used for the queries with the Authorization header and token of the session.
+        The new client replaces the previous one in a single assignment : requests already running keep
+        the previous client, whose token is still valid for at least the refresh margin.
+        """
+        client = create_client(config.URL, config.APIkey, options=ClientOptions(headers={"Authorization": f"Bearer {session.access_token}"},
+                                                                                httpx_client=self.create_http_client()))
+        self.access_token = session.access_token
+        self.refresh_token_value = session.refresh_token
+        # expires_at is a timestamp in seconds, computed from expires_in if absent
+        if session.expires_at:
+            self.token_expires_at = session.expires_at
+        elif session.expires_in:
+            self.token_expires_at = time.time() + session.expires_in
+        else:
+            self.token_expires_at = None
+        self.client = client
+
+    def connect(self):
+        """Sign in to Supabase and create the authorized client (must be called with client_lock held)"""
         try :
-            # Create the Supabase client
-            self.supabase = create_client(config.URL, config.APIkey)
+            start = time.perf_counter()
+            # Create the Supabase client used for the authentication, the token refresh is handled by refresh_token()
+            self.auth_client = create_client(config.URL, config.APIkey, options=ClientOptions(auto_refresh_token=False))
+            self.startup_timings['create_client'] = (time.perf_counter() - start) * 1000
 
             # User connection with email and password
-            auth_response = self.supabase.auth.sign_in_with_password({
+            start = time.perf_counter()
+            auth_response = self.auth_client.auth.sign_in_with_password({
                 "email": config.email,
                 "password": config.password
             })
+            self.startup_timings['sign_in'] = (time.perf_counter() - start) * 1000
 
-            # Get the JWT token
-            token = auth_response.session.access_token
-
-            # Re-create the client with the Authorization header and token
-            self.supabase : Client = create_client(config.URL, config.APIkey, options=ClientOptions(headers={"Authorization": f"Bearer {token}"}))
+            # Create the client used for the queries with the Authorization header and JWT token
+            start = time.perf_counter()
+            self.authorize(auth_response.session)
+            self.startup_timings['authorized_client'] = (time.perf_counter() - start) * 1000
             print("Supabase client initialized sucessfully")
         except Exception as e :
             print(f"Supabase client initialization error : {e}")
             raise
 
+    def refresh_token(self):
+        """Refresh the JWT token and swap the authorized client (must be called with client_lock held)"""
+        start = time.perf_counter()
+        try :
+            auth_response = self.auth_client.auth.refresh_session(self.refresh_token_value)
+            self.authorize(auth_response.session)
+        except Exception as e :
+            # The refresh token may have been revoked : sign in again
+            print(f"Supabase token refresh error, signing in again : {e}")
+            self.token_metrics['refresh_failures'] += 1
+            self.connect()
+        duration = (time.perf_counter() - start) * 1000
+        self.token_metrics['refresh_count'] += 1
+        self.token_metrics['last_refresh_ms'] = duration
+        self.token_metrics['total_refresh_ms'] += duration
+        print(f"Supabase token refreshed in {duration:.0f} ms")
+
+    def metrics(self):
+        """
+        Returns:
+            dict: startup timings and token refresh metrics
+        """
+        return {
+            'startup_timings': self.startup_timings,
+            'token': dict(self.token_metrics, expires_in=round(self.token_expires_at - time.time()) if self.token_expires_at else None)
+        }
+
+    def after_fork(self):
+        """
+        Reset the state that a forked process must not share with its parent (called in the child) : the locks may
+        have been held by a thread of the parent, which does not exist in the child, and the connections of the pool
+        would be used by both processes. The child connects again on first use or with its own health check.
+        """
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.http_transport = None
+        self.auth_client = None
+        self.storage_client = None
+        self.storage_token = None
+        self.access_token = None
+        self.refresh_token_value = None
+        self.token_expires_at = None
+        self.daily_lock = threading.Lock()
+        self.catalog.lock = threading.Lock()
+        self.previews.lock = threading.Lock()
+        if self.health_check_started:
+            self.start_health_check()
+
+    def start_health_check(self):
+        """Connect and test the connection in a background thread, so that the workers can serve without waiting for it"""
+        self.health_check_started = True
+        threading.Thread(target=self.health_check, name="supabase-health-check", daemon=True).start()
+
+    def health_check(self):
+        """
+        Connect to Supabase and test the connection, retrying with an exponential backoff
+        (HEALTH_CHECK_RETRIES attempts, starting at HEALTH_CHECK_BACKOFF seconds).
+
+        Returns:
+            bool: True if the connection works, False if all the attempts failed
+        """
+        retries = getattr(config, 'HEALTH_CHECK_RETRIES', 5)
+        backoff = getattr(config, 'HEALTH_CHECK_BACKOFF', 1)
+        for attempt in range(retries):
+            try :
+                # First use of the client : connects to Supabase
+                self.supabase
+                start = time.perf_counter()
+                if self.test_connection():
+                    self.startup_timings['test_connection'] = (time.perf_counter() - start) * 1000
+                    print("Supabase startup timings : " + ", ".join(f"{step} {duration:.0f} ms" for step, duration in self.startup_timings.items()))
+                    return True
+            except Exception :
+                pass
+            if attempt < retries - 1:
+                print(f"Supabase health check failed, new attempt in {backoff} s")
+                time.sleep(backoff)
+                backoff *= 2
+        print(f"Supabase health check failed after {retries} attempts")
+        return False
+
     def test_connection(self):
         """
         Tests the Supabase/database connection
@@ -35,140 +405,460 @@ class SupabaseManager():
             bool: True if connection works, False otherwise
         """
         try:
-            response = self.supabase.table('Pichunt_images').select('count').execute()
-            print(f"Connection test successful : {response.data[0]['count'] if response.data and 'count' in response.data[0] else 'unknown'} images in database.")
+            # Estimated count from the table statistics, without any row and without counting the whole table
+            response = self.supabase.table('Pichunt_images').select('id', count='estimated', head=True).execute()
+            print(f"Connection test successful : {response.count if response.count is not None else 'unknown'} images in database.")
             return True
 
         except Exception as e:
             print(f"Connection test failed: {e}")
             return False
 
-    def get_random_image(self, game_logic, difficulty="Easy"):
+    def select_all(self, table:str, columns:str) -> list:
+        """
+        Read all the rows of a table, page by page in the order of their id : a single select is silently
+        truncated by PostgREST to its max-rows setting.
+
+        Args :
+            table (str) : name of the table
+            columns (str) : selected columns, must include id
+
+        Returns :
+            list : all the rows of the table
+        """
+        rows = []
+        while True:
+            response = self.supabase.table(table).select(columns).order("id").range(len(rows), len(rows) + self.PAGE_SIZE - 1).execute()
+            # A page may be shorter than PAGE_SIZE if max-rows is lower : only an empty page ends the table
+            if not response.data:
+                return rows
+            rows.extend(response.data)
+
+    def format_image(self, row):
+        """
+        Map a row of Pichunt_images to the image dict sent to the frontend.
+
+        Returns :
+            dict : id, url, srcset, srcset_avif, placeholder, realm, area, location, difficulty, rating_count
+        """
+        variants = row.get('variants') or {}
+        return {
+            'id' : row['id'],
+            'url' : row['image'],
+            'srcset' : srcset(variants.get('webp', {})),
+            'srcset_avif' : srcset(variants.get('avif', {})),
+            'placeholder' : row.get('placeholder') or '',
+            'realm' : row['realm'],
+            'area' : row['area'],
+            'location' : row['location'] or '',
+            'difficulty' : row['difficulty'],
+            'rating_count': row['rating_count']
+        }
+
+    def refresh_catalog(self, game_logic, force=False):
+        """
+        Reload the image catalog from Supabase if its TTL has expired.
+        Only one thread reloads it, the others keep reading the previous catalog meanwhile.
+
+        Args :
+            force (bool) : reload even if the catalog is still fresh
+        """
+        if not force and not self.catalog.is_stale():
+            return
+        # Another thread is already reloading : serve the previous catalog if there is one
+        if not self.catalog.lock.acquire(blocking=self.catalog.loaded_at is None):
+            return
+        try :
+            if force or self.catalog.is_stale():
+                rows = self.select_all("Pichunt_images", self.IMAGE_COLUMNS)
+                self.catalog.load(rows, game_logic)
+                print(f"Image catalog loaded : {len(rows)} images")
+        finally :
+            self.catalog.lock.release()
+
+    def sample_random_image(self, game_logic, difficulty="Easy", deck=None):
+        """
+        Pick a random image of the difficulty range directly in the database, without keeping a catalog in memory.
+        Two small queries are made : the number of images in the range, then the single image at a random offset
+        (or at the next offset of the player's deck if given).
+
+        Returns :
+            dict|None : the row of Pichunt_images, None if there is no image for this difficulty
+        """
+        difficulty_range = game_logic.get_difficulty_range(difficulty)
+        # head=True : only the count travels, not the rows
+        response = self.supabase.table("Pichunt_images").select('id', count='exact', head=True).gte("difficulty", difficulty_range[0]).lt("difficulty", difficulty_range[1]).execute()
+        if not response.count :
+            return None
+
+        # Ordering on the id keeps the offsets stable between the two queries
+        offset = game_logic.draw_from_deck(deck, response.count) if deck is not None else random.randrange(response.count)
+        response = self.supabase.table("Pichunt_images").select(self.IMAGE_COLUMNS).gte("difficulty", difficulty_range[0]).lt("difficulty", difficulty_range[1]).order("id").range(offset, offset).execute()
+        return response.data[0] if response.data else None
+
+    def get_random_image(self, game_logic, difficulty="Easy", deck=None):
         """
         Get a random image based on a difficulty level.
+        The image is picked in the in-process catalog, reloaded from Supabase when stale,
+        or sampled in the database if the catalog cache is disabled (CATALOG_CACHE_TTL = 0).
 
         Args :
             difficulty (float) : 0.0 - 0.32 (easy), 0.33 - 0.66 (medium), 0.67 - 1.01 (hard)
+            deck (dict) : the player's deck for this difficulty, to draw the images without repetition (updated in place)
         
         Returns :
-            dict : the image and its information : id, url, realm, area, location, difficulty, appeared
+            dict : the image and its information : id, url, realm, area, location, difficulty, rating_count
         """
         try :
-            # Query, similar to SQL, to get the images filtering on the difficulty
-            # eq operator for 'equal'
-            difficulty_range = game_logic.get_difficulty_range(difficulty)
-            response = self.supabase.table("Pichunt_images").select('*').gte("difficulty", difficulty_range[0]).lt("difficulty", difficulty_range[1]).execute()
+            if self.catalog.ttl > 0:
+                self.refresh_catalog(game_logic)
+                random_image = self.catalog.pick(difficulty, game_logic, deck)
+            else:
+                random_image = self.sample_random_image(game_logic, difficulty, deck)
 
-            if not response.data :
+            if not random_image :
                 print(f"No image found for difficulty : {difficulty}")
                 return None
 
-            # Select an image randomly among the ones we got via the request
-            random_image = random.choice(response.data)
-
-            return {
-                'id' : random_image['id'],
-                'url' : random_image['image'],
-                'realm' : random_image['realm'],
-                'area' : random_image['area'],
-                'location' : random_image['location'] or '',
-                'difficulty' : random_image['difficulty'],
-                'rating_count': random_image['rating_count']
-            }
+            return self.format_image(random_image)
         
         except Exception as e :
             print(f"Error while getting a random image for the difficulty : {e}")
             raise
 
 
+    def get_scheduled_daily(self, day):
+        """
+        Get the image planned in the Daily_schedule table for a day.
+
+        Args :
+            day (str) : date in ISO format 'YYYY-MM-DD'
+
+        Returns :
+            dict|None : the row of Pichunt_images, None if nothing is planned for this day
+        """
+        response = self.supabase.table("Daily_schedule").select(f"image_id, Pichunt_images({self.DAILY_COLUMNS})").eq("day", day).execute()
+        if response.data and response.data[0]['Pichunt_images']:
+            return response.data[0]['Pichunt_images']
+        return None
+
+    def choose_daily_candidate(self, day):
+        """
+        Choose an image for the daily challenge : the image which already appeared on this day if there is one,
+        else a random image among the ones never shown, else the least recently shown image.
+
+        Args :
+            day (str) : date in ISO format 'YYYY-MM-DD'
+
+        Only the id of the candidate is read : the image is read back once the day is claimed (see get_scheduled_daily).
+
+        Returns :
+            dict|None : {'id'} of the candidate image, None if there is no image
+        """
+        # Check whether there is a daily image already:
+        response = self.supabase.table("Pichunt_images").select("id").eq("appeared", day).execute()
+        if response.data:
+            return response.data[0]
+
+        # Get all images without filtering on difficulty (daily's difficulty will vary)
+        # But on filtering on the images which never appeared
+        response = self.supabase.table("Pichunt_images").select("id").filter("appeared", "is", "null").execute()
+        if response.data:
+            return random.choice(response.data)
+
+        # Else the least recently shown image
+        response = self.supabase.table("Pichunt_images").select("id").order("appeared", nullsfirst=False).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def get_answer(self, game_logic, image_id):
+        """
+        Get the answer of an image from the answer index of the catalog, in O(1).
+        An image missing from the index (added since the last refresh, or catalog cache disabled) is queried,
+        and added to the index until the next refresh when the cache is enabled.
+
+        Args :
+            image_id (int) : id of the image
+
+        Returns :
+            dict|None : realm, area and location of the image, None if the image does not exist
+        """
+        if self.catalog.ttl > 0:
+            self.refresh_catalog(game_logic)
+        version = self.catalog.version
+        answer = self.catalog.answers.get(image_id)
+        if answer is None:
+            response = self.supabase.table("Pichunt_images").select(self.ANSWER_COLUMNS).eq("id", image_id).execute()
+            if not response.data:
+                return None
+            row = response.data[0]
+            answer = {'realm': row['realm'], 'area': row['area'], 'location': row['location'] or ''}
+            self.catalog.remember('answers', version, image_id, answer)
+        return answer
+
+    def get_image_url(self, game_logic, image_id, format=None, width=None):
+        """
+        Get the origin URL of an image, or of one of its variants, from the catalog, queried if the image is missing from it.
+
+        Args :
+            image_id (int) : id of the image
+            format (str|None) : format of the variant ("webp" or "avif"), None for the original image
+            width (int|None) : width of the variant
+
+        Returns :
+            str|None : URL of the image or of the variant, None if it does not exist
+        """
+        if self.catalog.ttl > 0:
+            self.refresh_catalog(game_logic)
+        version = self.catalog.version
+        urls = self.catalog.urls.get(image_id)
+        if urls is None:
+            response = self.supabase.table("Pichunt_images").select("id, image, variants").eq("id", image_id).execute()
+            if not response.data:
+                return None
+            urls = {'image': response.data[0]['image'], 'variants': response.data[0].get('variants') or {}}
+            self.catalog.remember('urls', version, image_id, urls)
+        if format is None:
+            return urls['image']
+        return urls['variants'].get(format, {}).get(str(width))
+
     def get_supabase_daily(self):
         """
-        Get the daily image based on the current date
+        Get the daily image based on the current date.
+        The image is read from the Daily_schedule table if it has been planned (see schedule_daily_images).
+        Else a candidate is chosen and claimed for the day with an insert that does nothing if the day is already
+        claimed : when several requests arrive at the same time, only one image wins and all of them return it.
+        Once found, it is kept in memory : the next calls of the day make no database call.
         
         Returns :
             dict : the selected image for the daily challenge and its information : id, url, realm, area, location, difficulty, appeared
         """
-        # Calculate the limit date for filtering
         today = datetime.now()
-        today_date = today.strftime('%Y-%m-%d')
-        one_year_ago = today - timedelta(days=365)
-        date = one_year_ago.strftime('%Y-%m-%d')  # Expected by Supabase ISO format
+        today_date = today.strftime('%Y-%m-%d')  # Expected by Supabase ISO format
+
+        # The memo may be swapped by another thread at midnight : a single get()
+        daily_image = self.daily_memo.get(today_date)
+        if daily_image:
+            return daily_image
 
         try :
-            # Check whether there is a daily image already:
-            response = self.supabase.table("Pichunt_images").select("*").eq("appeared", today_date).execute()
-            if response.data:
-                daily_image = response.data[0]
+            # Only one thread of this process looks for the daily image, the others wait for its result
+            with self.daily_lock:
+                daily_image = self.daily_memo.get(today_date)
+                if daily_image:
+                    return daily_image
 
-            else:
-                # Get all images without filtering on difficulty (daily's difficulty will vary)
-                # But on filtering on the "appeared" date that has to be a year ago or more
-                # or operator for 'select images that comply with this condition OR this one'
-                # lte operator for 'less than or equal'
-                response = self.supabase.table("Pichunt_images").select('*').filter("appeared", "is", "null").execute()
-
-                if not response.data:
-                    response = self.supabase.table("Pichunt_images").select('*').order("appeared", nullsfirst=False).execute()
-                    if not response.data:
-                        print(f"No image found for the daily on date : {today.strftime('%Y-%m-%d')}")
+                daily_image = self.get_scheduled_daily(today_date)
+                if not daily_image:
+                    candidate = self.choose_daily_candidate(today_date)
+                    if not candidate:
+                        print(f"No image found for the daily on date : {today_date}")
+                        return None
+
+                    # INSERT ... ON CONFLICT (day) DO NOTHING : the first request (of any worker) claims the day
+                    self.supabase.table("Daily_schedule").upsert({'day': today_date, 'image_id': candidate['id']}, on_conflict="day", ignore_duplicates=True, returning="minimal").execute()
+                    # Read the winner back, which may be the candidate of another request
+                    daily_image = self.get_scheduled_daily(today_date)
+                    if not daily_image:
+                        print(f"Error while claiming the daily image for the date : {today_date}")
                         return None
-                    else:
-                        daily_image = response.data[0]
-                else:
-                    daily_image = random.choice(response.data)
-
-            # Updating the column "appeared" in the Supabase table for the daily_image (filtering on the id)
-            self.supabase.table("Pichunt_images").update({'appeared': today.strftime('%Y-%m-%d')}).eq('id', daily_image['id']).execute()
-
-            return {
-                'id' : daily_image['id'],
-                'url' : daily_image['image'],
-                'realm' : daily_image['realm'],
-                'area' : daily_image['area'],
-                'location' : daily_image['location'] or '',
-                'difficulty' : daily_image['difficulty'],
-                'appeared' : daily_image['appeared'],
-                'rating_count' : daily_image['rating_count']
-            }
+
+                # Updating the column "appeared" in the Supabase table for the daily_image (filtering on the id), only once a day
+                if daily_image['appeared'] != today_date:
+                    self.supabase.table("Pichunt_images").update({'appeared': today_date}, returning="minimal").eq('id', daily_image['id']).execute()
+
+                image = self.format_image(daily_image)
+                image['appeared'] = daily_image['appeared']
+                # Only today's image is kept in memory
+                self.daily_memo = {today_date: image}
+                return image
 
         except Exception as e :
             print(f"Error while getting a daily image for the current date : {e}")
             raise
 
+    def schedule_daily_images(self, days=30):
+        """
+        Plan the daily images of the next days in the Daily_schedule table, with the same policy as get_supabase_daily :
+        the images never shown first (in a random order), then the least recently shown ones.
+        Days already planned are kept.
+
+        Args :
+            days (int) : number of days to plan, starting today
+
+        Returns :
+            dict : the new planned days {'YYYY-MM-DD': image id}
+        """
+        today = date.today()
+        dates = [(today + timedelta(days=i)).isoformat() for i in range(days)]
+
+        response = self.supabase.table("Daily_schedule").select("day, image_id").gte("day", dates[0]).execute()
+        planned = {row['day']: row['image_id'] for row in response.data or []}
+
+        images = [row for row in self.select_all("Pichunt_images", "id, appeared") if row['id'] not in planned.values()]
+        if not images:
+            print("No image available to plan the daily schedule")
+            return {}
+
+        never_shown = [row['id'] for row in images if row['appeared'] is None]
+        random.shuffle(never_shown)
+        least_recently_shown = [row['id'] for row in sorted((row for row in images if row['appeared'] is not None), key=lambda row: row['appeared'])]
+        candidates = never_shown + least_recently_shown
+
+        schedule = {}
+        for day in dates:
+            if day not in planned:
+                # If there are more days than images, the candidates are used again in the same order
+                schedule[day] = candidates[len(schedule) % len(candidates)]
+
+        if schedule:
+            # ON CONFLICT (day) DO NOTHING : a day claimed meanwhile by get_supabase_daily keeps its image
+            self.supabase.table("Daily_schedule").upsert([{'day': day, 'image_id': image_id} for day, image_id in schedule.items()], on_conflict="day", ignore_duplicates=True, returning="minimal").execute()
+        return schedule
+
+    def format_preview(self, row):
+        """
+        Map a row of Preview_images to the preview dict sent to the frontend.
+
+        Returns :
+            dict : id, url, srcset, srcset_avif, type, realm, area, location
+        """
+        variants = row.get("variants") or {}
+        return {
+            "id": row["id"],
+            "url": row["URL"],
+            "srcset": srcset(variants.get("webp", {})),
+            "srcset_avif": srcset(variants.get("avif", {})),
+            "type": row["Type"],
+            "realm": row["Realm"],
+            "area": row["Area"],
+            "location": row["Location"],
+        }
+
+    def refresh_previews(self, force=False, ttl=None):
+        """
+        Reload all the preview images from Supabase if their TTL has expired.
+        Only one thread reloads them, the others keep reading the previous previews meanwhile.
+
+        Args :
+            force (bool) : reload even if the previews are still fresh
+            ttl (int|None) : TTL to check instead of PREVIEW_CACHE_TTL (see the preview manifest)
+        """
+        if not force and not self.previews.is_stale(ttl):
+            return
+        # Another thread is already reloading : serve the previous previews if there are some
+        if not self.previews.lock.acquire(blocking=self.previews.loaded_at is None):
+            return
+        try :
+            if force or self.previews.is_stale(ttl):
+                rows = self.select_all("Preview_images", self.PREVIEW_COLUMNS)
+                self.previews.load([self.format_preview(row) for row in rows])
+                print(f"Preview images loaded : {len(rows)} previews")
+        finally :
+            self.previews.lock.release()
+
     def get_preview_image(self, type:str, realm:str, area:str="", location:str="") -> dict|None:
+        """
+        Preview image of a realm, area or location : from the preview cache, or queried in Preview_images
+        if the cache is disabled.
+
+        Returns :
+            dict|None : id, url, type, realm, area, location, None if there is no preview
+        """
         try:
-            print("get preview image for:",type,": ", realm, ",", area, ",", location)
-            query = self.supabase.table("Preview_images").select("*").eq("Type", type.capitalize()).eq("Realm", realm)
+            if self.previews.ttl > 0:
+                self.refresh_previews()
+                return self.previews.get(type, realm, area, location)
+
+            query = self.supabase.table("Preview_images").select(self.PREVIEW_COLUMNS).eq("Type", type.capitalize()).eq("Realm", realm)
             if type.capitalize() in ["Area", "Location"]:
                 query = query.eq("Area", area)
             if type.capitalize() == "Location":
                 query = query.eq("Location", location)
             response = query.execute()
-            print("response: ", response, "data:", response.data)
             if response.data:
-                return {
-                    "id": response.data[0]["id"],
-                    "url": response.data[0]["URL"],
-                    "type": response.data[0]["Type"],
-                    "realm": response.data[0]["Realm"],
-                    "area": response.data[0]["Area"],
-                    "location": response.data[0]["Location"],
-                }
+                return self.format_preview(response.data[0])
         except Exception as e:
             print(f"Error while getting a preview image : {e}")
             raise
 
     def add_rating(self, picture_id:int, rating:int):
-        response = self.supabase.table("Pichunt_images").select("*").eq("id", picture_id).execute()
+        """
+        Add a player's rating to the difficulty of a picture, in a single atomic call to the add_rating
+        Postgres function (see sql/functions.sql) : the running mean is computed by the database.
+
+        Args :
+            picture_id (int) : id of the rated picture
+            rating (int) : rating between 1 (easy) and 5 (hard)
+
+        Returns :
+            dict : the new difficulty and rating_count of the picture, None if the update failed
+        """
+        response = self.supabase.rpc("add_rating", {"picture_id": picture_id, "rating": rating}).execute()
         if response.data:
-            rating_float = 0.25*rating-0.25
-            difficulty_before, rating_count_before=response.data[0]["difficulty"], response.data[0]["rating_count"]
-            difficulty_now = (1.0*difficulty_before*rating_count_before+rating_float)/(rating_count_before+1)
-            response = self.supabase.table("Pichunt_images").update({"difficulty":difficulty_now, "rating_count": rating_count_before+1}).eq("id", picture_id).execute()
-            if response.data:
-                print("updated ratings: "+str(response.data))
-                return True
-            else:
-                print("error: ", response)
+            print("updated ratings: "+str(response.data))
+            return response.data[0]
         else:
             print("error: ", response)
+
+    def add_ratings(self, deltas:list):
+        """
+        Apply a batch of aggregated ratings in one call to the add_ratings Postgres function (see sql/functions.sql).
+
+        Args :
+            deltas (list) : [{'id': picture id, 'sum': sum of the ratings, 'count': number of ratings}, ...]
+
+        Returns :
+            int : number of updated pictures
+        """
+        response = self.supabase.rpc("add_ratings", {"deltas": deltas}).execute()
+        return response.data
+
+    def get_storage(self):
+        """
+        Storage client of the uploads, rebuilt when the token is refreshed.
+        supabase-py sets its base URL on the httpx client given in ClientOptions when it creates the PostgREST or
+        the Storage sub-client : sharing the httpx client of self.client would send the next queries to /storage/v1.
+        The storage client gets its own httpx client (on the same connection pool).
+        """
+        self.supabase
+        if self.storage_client is None or self.storage_token != self.access_token:
+            token = self.access_token
+            client = create_client(config.URL, config.APIkey, options=ClientOptions(headers={"Authorization": f"Bearer {token}"},
+                                                                                    httpx_client=self.create_http_client(),
+                                                                                    auto_refresh_token=False))
+            self.storage_client = client.storage
+            self.storage_token = token
+        return self.storage_client
+
+    def upload_variant(self, path:str, data:bytes, content_type:str) -> str:
+        """
+        Upload a variant of an image to the Supabase Storage bucket IMAGE_VARIANTS_BUCKET (replaced if it exists).
+        The variants never change for a path : the browsers and the CDN may keep them for a year.
+
+        Returns :
+            str : public URL of the variant
+        """
+        bucket = self.get_storage().from_(getattr(config, 'IMAGE_VARIANTS_BUCKET', 'variants'))
+        bucket.upload(path, data, {"content-type": content_type, "cache-control": "31536000", "upsert": "true"})
+        return bucket.get_public_url(path)
+
+    def set_variants(self, table:str, image_id:int, variants:dict):
+        """
+        Store the URLs of the variants of an image in its variants column.
+
+        Args :
+            table (str) : "Pichunt_images" or "Preview_images"
+            image_id (int) : id of the image
+            variants (dict) : {format: {width: url}}
+        """
+        self.supabase.table(table).update({"variants": variants}, returning="minimal").eq("id", image_id).execute()
+
+    def set_placeholder(self, image_id:int, placeholder:str):
+        """
+        Store the placeholder (tiny data URI) of an image in its placeholder column.
+
+        Args :
+            image_id (int) : id of the image
+            placeholder (str) : data URI of the placeholder
+        """
+        self.supabase.table("Pichunt_images").update({"placeholder": placeholder}, returning="minimal").eq("id", image_id).execute()
@@ -0,0 +1,175 @@
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+import httpx
+
+class DiskImageCache():
+    """
+    Size-bounded LRU cache of the images on the local disk, used by the /img/<id> proxy.
+    An image is downloaded from its origin once (streamed to a temporary file, then moved in place),
+    then served from the disk. The least recently served images are deleted when the cache exceeds max_bytes.
+    The directory is the source of truth, shared by all the workers : an image downloaded by a worker is served
+    by the others, and the size bound is checked on the files of the directory (the access time of a file
+    is its last use).
+    An image is stored under its key (the image id, or id-width-format for a variant) and the extension of its content
+    type, one of EXTENSIONS : a lookup checks these few names instead of listing the directory.
+    """
+
+    # Extension of the files by content type, "" for the other types
+    EXTENSIONS = {"image/jpeg": ".jpg", "image/webp": ".webp", "image/avif": ".avif", "image/png": ".png", "image/gif": ".gif"}
+
+    def __init__(self, directory, max_bytes=1024**3, timeout=30):
+        """
+        Args:
+            directory (str): folder of the cached images, created if needed
+            max_bytes (int): maximum total size of the cached images
+            timeout (float): timeout of the downloads from the origin, in seconds
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+
+        # {key: file name} of the images already found by this process, a hint checked on the disk
+        self.names = {}
+        self.lock = threading.Lock()
+        # One lock per image being downloaded : concurrent requests for a cold image download it only once
+        self.download_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, key):
+        """
+        Returns:
+            str|None: name of the file of an image in the directory (e.g. "12.jpg"), None if there is none
+        """
+        for extension in list(self.EXTENSIONS.values()) + [""]:
+            if os.path.isfile(os.path.join(self.directory, key + extension)):
+                return key + extension
+        return None
+
+    def get(self, key):
+        """
+        Returns:
+            str|None: path of the cached image, None if it is not in the cache
+        """
+        key = str(key)
+        name = self.names.get(key) or self.find(key)
+        if name is None:
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            # Mark the image as recently used, without changing its modification time (the ETag of the responses)
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            # Evicted by a worker
+            self.names.pop(key, None)
+            return None
+        self.names[key] = name
+        return path
+
+    def fetch(self, key, url):
+        """
+        Path of an image on the disk, downloaded from its origin URL if it is not cached yet.
+
+        Args:
+            key (int|str): id of the image, or "id-width-format" for a variant
+            url (str): origin URL of the image
+
+        Returns:
+            str: path of the cached image
+        """
+        key = str(key)
+        path = self.get(key)
+        if path:
+            self.hits += 1
+            return path
+
+        with self.lock:
+            download_lock = self.download_locks.setdefault(key, threading.Lock())
+        with download_lock:
+            # Downloaded by another request meanwhile
+            path = self.get(key)
+            if path:
+                self.hits += 1
+                return path
+
+            self.misses += 1
+            try:
+                path = self.download(key, url)
+            finally:
+                with self.lock:
+                    self.download_locks.pop(key, None)
+        return path
+
+    def download(self, key, url):
+        """Stream an image from its origin into the cache, then evict the least recently served images if needed"""
+        with httpx.stream("GET", url, timeout=self.timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip()
+            # Without a known content type, the extension of the URL if it is a known one
+            extension = self.EXTENSIONS.get(content_type) or self.EXTENSIONS.get(mimetypes.guess_type(httpx.URL(url).path)[0], "")
+            file, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".download-")
+            try:
+                with os.fdopen(file, "wb") as output:
+                    for chunk in response.iter_bytes():
+                        output.write(chunk)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+
+        name = key + extension
+        path = os.path.join(self.directory, name)
+        os.replace(temporary_path, path)
+        self.names[key] = name
+        with self.lock:
+            self.evict(keep=name)
+        return path
+
+    def scan(self):
+        """
+        Returns:
+            list: (name, size, access time) of the cached images, from the least to the most recently served
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_atime))
+            except FileNotFoundError:
+                # Evicted by a worker during the scan
+                pass
+        return sorted(files, key=lambda file: file[2])
+
+    def evict(self, keep=None):
+        """Delete the least recently served images of the directory until it fits in max_bytes (the keep file excepted)"""
+        files = self.scan()
+        size = sum(file[1] for file in files)
+        for name, file_size, _ in files:
+            if size <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            self.names.pop(name.split(".")[0], None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: counters of images served from the disk (hits) and downloaded (misses), number and size of the cached images
+        """
+        files = self.scan()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'images': len(files),
+            'bytes': sum(file[1] for file in files)
+        }
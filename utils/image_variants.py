@@ -0,0 +1,172 @@
+import base64
+import io
+import httpx
+
+# Optional dependency, only needed by the image-variants and image-placeholders commands
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+# Widths of the variants, in pixels (an image is never enlarged : the widths above the original one are skipped)
+DEFAULT_WIDTHS = [320, 640, 1280]
+# Encoding options of each format
+FORMAT_OPTIONS = {
+    'webp': {'quality': 80, 'method': 6},
+    'avif': {'quality': 60}
+}
+
+def available_formats():
+    """
+    Returns:
+        list: formats of the variants that Pillow can encode here, WebP first then AVIF
+    """
+    if Image is None:
+        return []
+    return [format for format in FORMAT_OPTIONS if features.check(format)]
+
+def make_variants(data, widths=DEFAULT_WIDTHS, formats=None):
+    """
+    Resize and encode an image in each width and format.
+
+    Args:
+        data (bytes): the original image
+        widths (list): widths of the variants
+        formats (list): formats of the variants, all the available ones by default
+
+    Returns:
+        dict: {format: {width: encoded image (bytes)}}
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate the image variants (pip install pillow)")
+    formats = formats or available_formats()
+
+    original = Image.open(io.BytesIO(data))
+    original.load()
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    variants = {format: {} for format in formats}
+    for width in sorted(widths):
+        if width > original.width:
+            continue
+        resized = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+        for format in formats:
+            output = io.BytesIO()
+            resized.save(output, format=format.upper(), **FORMAT_OPTIONS[format])
+            variants[format][width] = output.getvalue()
+    return variants
+
+# Width of the placeholders, in pixels : a few hundred bytes, displayed stretched until the image is loaded
+PLACEHOLDER_WIDTH = 24
+
+def make_placeholder(data, width=PLACEHOLDER_WIDTH):
+    """
+    Tiny low-quality version of an image, inlined as a data URI.
+
+    Args:
+        data (bytes): the original image
+        width (int): width of the placeholder, its height keeps the aspect ratio of the image
+
+    Returns:
+        str: "data:image/webp;base64,..." (JPEG if Pillow cannot encode WebP here)
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate the placeholders (pip install pillow)")
+    original = Image.open(io.BytesIO(data))
+    original.draft("RGB", (width * 4, width * 4))
+    tiny = original.convert("RGB").resize((width, max(1, round(original.height * width / original.width))), Image.LANCZOS)
+
+    format = "webp" if features.check("webp") else "jpeg"
+    output = io.BytesIO()
+    tiny.save(output, format=format.upper(), quality=30)
+    return f"data:image/{format};base64,{base64.b64encode(output.getvalue()).decode()}"
+
+def srcset(urls):
+    """
+    Build the srcset attribute of an <img> from the URLs of the variants of one format.
+
+    Args:
+        urls (dict): {width: url}
+
+    Returns:
+        str: "url 320w, url 640w, ...", "" if there is no variant
+    """
+    return ", ".join(f"{url} {width}w" for width, url in sorted(urls.items(), key=lambda item: int(item[0])))
+
+def srcset_widths(value):
+    """
+    Widths of the variants of a srcset attribute built by srcset.
+
+    Returns:
+        list: [320, 640, ...], empty if there is no variant
+    """
+    return [int(entry.rsplit(" ", 1)[1][:-1]) for entry in value.split(", ")] if value else []
+
+def generate_variants(db_manager, table, widths=DEFAULT_WIDTHS, force=False):
+    """
+    Generate the variants of every image of a table (Pichunt_images or Preview_images), upload them to the
+    Supabase Storage bucket IMAGE_VARIANTS_BUCKET and store their URLs in the variants column of the rows.
+
+    Args:
+        db_manager (SupabaseManager): the database connection
+        table (str): "Pichunt_images" or "Preview_images"
+        widths (list): widths of the variants
+        force (bool): also regenerate the images that already have variants
+
+    Yields:
+        tuple: (id of the image, number of variants generated, error message or None)
+    """
+    url_column = "image" if table == "Pichunt_images" else "URL"
+    formats = available_formats()
+    if not formats:
+        raise RuntimeError("Pillow is required to generate the image variants (pip install pillow)")
+
+    rows = db_manager.select_all(table, f"id, {url_column}, variants")
+    with httpx.Client(timeout=30, follow_redirects=True) as http_client:
+        for row in rows:
+            if row.get("variants") and not force:
+                continue
+            try:
+                original = http_client.get(row[url_column])
+                original.raise_for_status()
+                variants = make_variants(original.content, widths, formats)
+
+                urls = {}
+                for format, images in variants.items():
+                    urls[format] = {}
+                    for width, image in images.items():
+                        path = f"{table}/{row['id']}/{width}.{format}"
+                        urls[format][str(width)] = db_manager.upload_variant(path, image, f"image/{format}")
+                db_manager.set_variants(table, row["id"], urls)
+                yield row["id"], sum(len(images) for images in urls.values()), None
+            except Exception as e:
+                yield row["id"], 0, str(e)
+
+def generate_placeholders(db_manager, force=False):
+    """
+    Compute the placeholder of every image of Pichunt_images and store it in the placeholder column of the rows.
+
+    Args:
+        db_manager (SupabaseManager): the database connection
+        force (bool): also recompute the images that already have a placeholder
+
+    Yields:
+        tuple: (id of the image, size of the placeholder in bytes, error message or None)
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate the placeholders (pip install pillow)")
+
+    rows = db_manager.select_all("Pichunt_images", "id, image, placeholder")
+    with httpx.Client(timeout=30, follow_redirects=True) as http_client:
+        for row in rows:
+            if row.get("placeholder") and not force:
+                continue
+            try:
+                original = http_client.get(row["image"])
+                original.raise_for_status()
+                placeholder = make_placeholder(original.content)
+                db_manager.set_placeholder(row["id"], placeholder)
+                yield row["id"], len(placeholder), None
+            except Exception as e:
+                yield row["id"], 0, str(e)
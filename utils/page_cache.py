@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+import time
+from flask import current_app, render_template, request
+
+class PageCache():
+    """
+    Cache of the rendered pages (menu, game).
+    A page only depends on its template, its arguments (mode, difficulty) and the locations version : it is
+    rendered once and then served from memory. The only per-player value, the score, is rendered as a
+    placeholder and substituted in the cached page for each request.
+    The cache is emptied when a template file changes. The locations version is fixed for the life of the
+    process (the locations are compiled at import) : a new version comes with a restart.
+    """
+
+    SCORE_PLACEHOLDER = "__SESSION_SCORE__"
+
+    def __init__(self, app, version="", check_interval=2):
+        """
+        Args:
+            app (Flask): the application, for its templates folder
+            version (str): version of the data rendered in the pages (e.g. the locations version)
+            check_interval (float): minimum number of seconds between two checks of the templates modification times
+        """
+        self.template_folder = os.path.join(app.root_path, app.template_folder)
+        self.version = version
+        self.check_interval = check_interval
+
+        # {(template, arguments): (page, etag)}
+        self.pages = {}
+        self.lock = threading.Lock()
+        self.templates_mtime = self.get_templates_mtime()
+        self.checked_at = time.monotonic()
+
+        # Counted under the lock : the threads of a worker serve the pages at the same time
+        self.hits = 0
+        self.misses = 0
+
+    def get_templates_mtime(self):
+        """
+        Returns:
+            float: latest modification time of the template files
+        """
+        mtime = 0
+        for root, _, files in os.walk(self.template_folder):
+            for name in files:
+                mtime = max(mtime, os.path.getmtime(os.path.join(root, name)))
+        return mtime
+
+    def check_templates(self):
+        """Drop the cached pages if a template has been modified (checked every check_interval seconds)"""
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return
+        self.checked_at = time.monotonic()
+        mtime = self.get_templates_mtime()
+        if mtime != self.templates_mtime:
+            with self.lock:
+                self.templates_mtime = mtime
+                self.pages.clear()
+
+    def get_page(self, template, **arguments):
+        """
+        Rendered page of a template, from the cache if possible.
+
+        Returns:
+            tuple: (page with the score placeholder, ETag of the page)
+        """
+        self.check_templates()
+        key = (template, tuple(sorted(arguments.items())))
+        page = self.pages.get(key)
+        if page is not None:
+            with self.lock:
+                self.hits += 1
+            return page
+
+        html = render_template(template, score=self.SCORE_PLACEHOLDER, **arguments)
+        etag = hashlib.sha256((self.version+html).encode()).hexdigest()[:16]
+        page = (html, etag)
+        with self.lock:
+            self.misses += 1
+            self.pages[key] = page
+        return page
+
+    def render(self, template, score=None, **arguments):
+        """
+        Response of a page, with its ETag (304 if the browser's copy is up to date).
+        No Last-Modified date : the page changes with the score, a copy with an older score would be revalidated
+        by If-Modified-Since.
+
+        Args:
+            template (str): name of the template
+            score (int|None): score of the player, None if the player has no score yet
+            arguments: arguments of the template, they identify the page in the cache
+
+        Returns:
+            Response: the page
+        """
+        html, etag = self.get_page(template, has_score=score is not None, **arguments)
+        if score is not None:
+            html = html.replace(self.SCORE_PLACEHOLDER, str(int(score)))
+            etag += "-"+str(int(score))
+
+        response = current_app.response_class(html, mimetype='text/html')
+        response.set_etag(etag)
+        # The page holds the player's score : only the browser may keep it, and it must revalidate it
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def stats(self):
+        """
+        Returns:
+            dict: counters of pages served from the cache (hits) and rendered (misses), and the number of cached pages
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'pages': len(self.pages)
+        }
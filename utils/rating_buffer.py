@@ -0,0 +1,137 @@
+import atexit
+import os
+import threading
+
+class RatingBuffer():
+    """
+    Write-behind buffer for the players' ratings.
+    /api/submit-rating only appends the vote here and returns, a background thread aggregates the votes
+    per picture into (sum, count) deltas and applies them in one bulk update.
+    """
+
+    def __init__(self, db_manager, flush_interval=5, flush_size=100, max_pictures=10000):
+        """
+        Args:
+            db_manager (SupabaseManager): used to apply the deltas with add_ratings
+            flush_interval (float): maximum number of seconds between two flushes
+            flush_size (int): number of pending votes that triggers a flush before the interval
+            max_pictures (int): maximum number of distinct pictures waiting for a flush, new votes are dropped above it
+        """
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pictures = max_pictures
+
+        # {picture_id: [sum of the ratings, number of ratings]}
+        self.pending = {}
+        self.pending_votes = 0
+        self.lock = threading.Lock()
+        self.wake_up = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.pid = None
+
+        # Counters of votes
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+
+        atexit.register(self.stop)
+
+    def start(self):
+        """Start the flusher thread, again if the process has been forked since (threads do not survive a fork)"""
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name="rating-buffer", daemon=True)
+                self.thread.start()
+
+    def add(self, picture_id, rating):
+        """
+        Queue a rating for a picture.
+
+        Args:
+            picture_id (int): id of the rated picture
+            rating (int): rating between 1 (easy) and 5 (hard)
+
+        Returns:
+            bool: True if the vote was queued, False if it was dropped because the buffer is full
+        """
+        self.start()
+        with self.lock:
+            if picture_id not in self.pending and len(self.pending) >= self.max_pictures:
+                self.dropped += 1
+                return False
+            delta = self.pending.setdefault(picture_id, [0, 0])
+            delta[0] += rating
+            delta[1] += 1
+            self.pending_votes += 1
+            self.queued += 1
+            if self.pending_votes >= self.flush_size:
+                self.wake_up.set()
+        return True
+
+    def run(self):
+        """Flusher thread loop : flush every flush_interval seconds or as soon as flush_size votes are pending"""
+        while not self.stopping:
+            self.wake_up.wait(self.flush_interval)
+            self.wake_up.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Apply all the pending votes in one bulk update.
+
+        Returns:
+            int: number of votes flushed
+        """
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, votes = self.pending, self.pending_votes
+            self.pending, self.pending_votes = {}, 0
+
+        deltas = [{'id': picture_id, 'sum': delta[0], 'count': delta[1]} for picture_id, delta in pending.items()]
+        try:
+            self.db_manager.add_ratings(deltas)
+        except Exception as e:
+            print(f"Error while flushing {votes} ratings : {e}")
+            # Put the votes back for the next flush, within the limit of the buffer
+            with self.lock:
+                for picture_id, (rating_sum, count) in pending.items():
+                    if picture_id not in self.pending and len(self.pending) >= self.max_pictures:
+                        self.dropped += count
+                        continue
+                    delta = self.pending.setdefault(picture_id, [0, 0])
+                    delta[0] += rating_sum
+                    delta[1] += count
+                    self.pending_votes += count
+            return 0
+
+        with self.lock:
+            self.flushed += votes
+        print(f"Ratings flushed : {votes} votes on {len(deltas)} pictures (queued={self.queued}, flushed={self.flushed}, dropped={self.dropped})")
+        return votes
+
+    def stop(self):
+        """Stop the flusher thread and flush the remaining votes (called on shutdown)"""
+        self.stopping = True
+        self.wake_up.set()
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            self.thread.join(timeout=self.flush_interval)
+        self.flush()
+
+    def stats(self):
+        """
+        Returns:
+            dict: counters of queued, flushed and dropped votes, and the number of votes waiting for a flush
+        """
+        with self.lock:
+            return {
+                'queued': self.queued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'pending': self.pending_votes
+            }
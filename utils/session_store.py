@@ -0,0 +1,192 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose data stays on the server, the cookie only holds its opaque id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+class MemoryStore():
+    """In-memory LRU store : fast, but the sessions are lost on restart and not shared between workers"""
+
+    def __init__(self, max_entries=10000):
+        """
+        Args:
+            max_entries (int): maximum number of sessions kept, the least recently used ones are evicted first
+        """
+        self.max_entries = max_entries
+        # {sid: (expiry timestamp, data)}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return entry[1]
+
+    def set(self, sid, data, ttl):
+        with self.lock:
+            self.entries[sid] = (time.time() + ttl, data)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+class SQLiteStore():
+    """SQLite store : the sessions survive restarts and are shared by all the workers of the machine"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): path of the SQLite database file, created if needed
+        """
+        self.path = path
+        # One connection per thread (sqlite3 connections must not be shared between threads)
+        self.local = threading.local()
+        self.writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Short-lived connection : the store may be created before gunicorn --preload forks the workers,
+        # which must not inherit an open connection
+        connection = sqlite3.connect(path, timeout=5)
+        try:
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        finally:
+            connection.close()
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=5)
+            # WAL : readers don't wait for the writers of the other workers
+            self.local.connection.execute("PRAGMA journal_mode=WAL")
+        return self.local.connection
+
+    def get(self, sid):
+        row = self.connection().execute("SELECT data FROM sessions WHERE sid = ? AND expires >= ?", (sid, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, sid, data, ttl):
+        with self.connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)", (sid, data, time.time() + ttl))
+            # Purge the expired sessions from time to time
+            self.writes += 1
+            if self.writes % 1000 == 0:
+                connection.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),))
+
+    def delete(self, sid):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+class RedisStore():
+    """Redis store : the sessions are shared by all the workers of all the machines"""
+
+    def __init__(self, client, prefix="session:"):
+        """
+        Args:
+            client: Redis-compatible client (get, setex and delete methods), e.g. redis.Redis.from_url(url)
+            prefix (str): prefix of the keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        data = self.client.get(self.prefix + sid)
+        return data.decode() if isinstance(data, bytes) else data
+
+    def set(self, sid, data, ttl):
+        self.client.setex(self.prefix + sid, int(ttl), data)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface keeping the session data in a store, the cookie only holds an opaque random id"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        """
+        Args:
+            store: MemoryStore, SQLiteStore or RedisStore
+        """
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(self.serializer.loads(data), sid=sid)
+        # Unknown or expired session : new id
+        return ServerSideSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # Emptied session : removed from the store and from the browser
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.set(session.sid, self.serializer.dumps(dict(session)), app.permanent_session_lifetime.total_seconds())
+
+        # The id never changes : the cookie is only sent when the session is created
+        if session.new or (session.permanent and self.should_set_cookie(app, session)):
+            response.set_cookie(name, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app),
+                                domain=domain,
+                                path=path,
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+
+def create_session_interface(app, backend, **options):
+    """
+    Create the session interface of the application for a backend.
+
+    Args:
+        app (Flask): the application
+        backend (str): "memory", "sqlite" or "redis" ("cookie" keeps the default signed cookie session of Flask)
+        options: max_entries (memory), path (sqlite), url (redis)
+
+    Returns:
+        SessionInterface|None: the interface, None for the cookie backend
+    """
+    if backend == "memory":
+        return ServerSideSessionInterface(MemoryStore(options.get('max_entries', 10000)))
+    if backend == "sqlite":
+        return ServerSideSessionInterface(SQLiteStore(options.get('path') or os.path.join(app.instance_path, 'sessions.sqlite3')))
+    if backend == "redis":
+        if not options.get('url'):
+            raise ValueError('SESSION_REDIS_URL must be defined in config.py for SESSION_BACKEND = "redis"')
+        # Optional dependency, only needed for this backend
+        import redis
+        return ServerSideSessionInterface(RedisStore(redis.Redis.from_url(options['url'])))
+    return None